@@ -0,0 +1,52 @@
+import os
+
+from train import QLearningAgent
+
+# TICTACTOE_Q_BACKEND=dense switches app.py / main_gui.py to the array Q-table
+Q_BACKEND = os.environ.get("TICTACTOE_Q_BACKEND", "dict")
+MODEL_FILES = {
+    "dict": "q_table.qtb",
+    "dense": "q_table.qtb",  # same entries as the dict table
+    "symmetric": "q_table_symmetric.qtb",
+    "dense-symmetric": "q_table_symmetric.npy",
+    "solver": "q_table.qtb",  # unused, the solver has no model file
+    "policy": "policy.bin",
+    "dqn": "dqn.npz",
+}
+
+
+def make_agent(backend=Q_BACKEND, **kwargs):
+    if backend == "dense":
+        from dense_q import DenseQLearningAgent
+
+        return DenseQLearningAgent(**kwargs)
+    elif backend == "dense-symmetric":
+        from dense_q import DenseQLearningAgent
+
+        return DenseQLearningAgent(symmetric=True, **kwargs)
+    elif backend == "symmetric":
+        from symmetry import SymmetricQLearningAgent
+
+        return SymmetricQLearningAgent(**kwargs)
+    elif backend == "solver":
+        from solver import SolverAgent
+
+        return SolverAgent(**kwargs)
+    elif backend == "policy":
+        from policy_file import PolicyAgent
+
+        return PolicyAgent(**kwargs)
+    elif backend == "dqn":
+        from dqn import DQNAgent
+
+        return DQNAgent(**kwargs)
+    elif backend == "dict":
+        return QLearningAgent(**kwargs)
+    raise ValueError(f"Unknown Q-table backend: {backend}")
+
+
+def serving_model_file(backend=Q_BACKEND):
+    """
+    model app.py / main_gui.py load
+    """
+    return MODEL_FILES[backend]
@@ -1,12 +1,31 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
 import os
 import sys
-from board import Board
+import threading
+import time
+import traceback
+from agents import make_agent, serving_model_file
+from bitboard import make_board
+from book import BOOK_FILE, get_book
+from checkpoint_log import CheckpointLog
+from grid_board import check_board_size, tactical_move
 from player import Player
-from train import QLearningAgent
+from serving_metrics import Registry
+from sessions import GameStore
+from transitions import legal_actions
 
 app = Flask(__name__)
 
+USE_BITBOARD = os.environ.get("TICTACTOE_BITBOARD", "1") == "1"
+MAX_GAMES = int(os.environ.get("TICTACTOE_MAX_GAMES", "10000"))
+GAME_TTL = float(os.environ.get("TICTACTOE_GAME_TTL", "3600"))
+# learn from finished web games in a background thread
+ONLINE_LEARNING = os.environ.get("TICTACTOE_ONLINE_LEARNING", "0") == "1"
+# opening book / endgame tablebase ahead of the Q-table
+USE_BOOK = os.environ.get("TICTACTOE_BOOK", "1") == "1"
+# seconds an AI move waits for the background model load before a 503
+MODEL_TIMEOUT = float(os.environ.get("TICTACTOE_MODEL_TIMEOUT", "30"))
+
 
 def resource_path(relative_path):
     if hasattr(sys, "_MEIPASS"):
@@ -15,14 +34,41 @@ def resource_path(relative_path):
         return os.path.join(os.path.abspath("."), relative_path)
 
 
+class ModelUnavailable(Exception):
+    """
+    the model is still loading, or loading it failed
+    """
+
+
+def wait_for_model():
+    if not model_ready.wait(MODEL_TIMEOUT):
+        raise ModelUnavailable("model is still loading")
+    if model_error is not None:
+        raise ModelUnavailable(f"model failed to load: {model_error!r}")
+
+
 class TicTacToeGame:
-    def __init__(self):
-        self.board = Board()
-        self.agent = QLearningAgent()
-        self.agent.load_model(resource_path("q_table.pkl"))
+    def __init__(self, agent, use_bitboard=USE_BITBOARD, rows=3, columns=3, k=3):
+        self.use_bitboard = use_bitboard
+        self.resize(rows, columns, k)
+        # shared by every game, only read while serving
+        self.agent = agent
         self.human_player = Player(is_human=True)
-        self.ai_player = Player(is_human=False, use_rl=True, q_table=self.agent.q_table)
+        self.ai_player = Player(
+            is_human=False, use_rl=True, q_table=self.agent.q_table, agent=self.agent
+        )
         self.current_player = self.human_player
+        self.history = []  # AI (state, action) pairs for online learning
+        self.decision_seconds = 0.0  # time the last ai_move spent choosing
+
+    def resize(self, rows, columns, k):
+        """
+        boards other than 3x3 are played by grid_board.tactical_move,
+        the Q-table only knows 3x3
+        """
+        self.size = (rows, columns, k)
+        self.board = make_board(self.use_bitboard, rows, columns, k)
+        self.use_agent = self.size == (3, 3, 3)
 
     def make_move(self, move):
         state, reward, done, _ = self.board.step(move, self.current_player.marker)
@@ -34,13 +80,46 @@ class TicTacToeGame:
         return self.get_board_state(), done
 
     def ai_move(self):
+        if not self.use_agent:
+            start = time.perf_counter()
+            move = tactical_move(self.board, "O").value
+            self.decision_seconds = time.perf_counter() - start
+            decision_seconds.observe(self.decision_seconds, "grid")
+            return self.make_move(move)
+        wait_for_model()
         state = self.board.board_to_state()
-        available_actions = [
-            i for i, cell in enumerate(state) if cell == self.board.EMPTY_CELL
-        ]
+        available_actions = legal_actions(state)
+        start = time.perf_counter()
         action = self.agent.choose_action(state, available_actions)
+        self.decision_seconds = time.perf_counter() - start
+        decision_seconds.observe(self.decision_seconds, "3x3")
+        book = self.agent.book
+        if self.agent.q_table is not None and not (book and book.covers(state)):
+            seen = self.agent.has_state(state)
+            q_table_lookups.inc("hit" if seen else "miss")
+        self.history.append((state, action))
         return self.make_move(action + 1)
 
+    def invalid_move(self, move):
+        """
+        why the human cannot play move (1-based) now, None if they can
+        """
+        if self.check_game_end() is not None:
+            return "game is over"
+        state = self.board.board_to_state()
+        if not 1 <= move <= len(state):
+            return f"move must be between 1 and {len(state)}"
+        if state[move - 1] != self.board.EMPTY_CELL:
+            return "cell is already taken"
+        return None
+
+    def ai_reward(self):
+        if self.board.check_winner("O"):
+            return 1
+        elif self.board.check_winner("X"):
+            return -1
+        return 0
+
     def check_game_end(self):
         if self.board.check_winner("X"):
             return "You win!"
@@ -53,6 +132,7 @@ class TicTacToeGame:
     def reset_game(self):
         self.board.reset_board()
         self.current_player = self.human_player
+        self.history = []
 
     def get_board_state(self):
         return [
@@ -65,7 +145,128 @@ class TicTacToeGame:
         ]
 
 
-game = TicTacToeGame()
+# per process, scraped from /metrics; the hot path only observes histograms
+# and bumps counters, everything else is read at scrape time
+metrics = Registry()
+request_seconds = metrics.histogram(
+    "tictactoe_request_duration_seconds",
+    "Time to handle a request, by endpoint.",
+    ("endpoint",),
+)
+overhead_seconds = metrics.histogram(
+    "tictactoe_request_overhead_seconds",
+    "Request time outside the AI's move choice, by endpoint.",
+    ("endpoint",),
+)
+decision_seconds = metrics.histogram(
+    "tictactoe_ai_decision_seconds",
+    "Time the AI spends choosing a move, by board (3x3 agent or grid).",
+    ("board",),
+)
+requests_total = metrics.counter(
+    "tictactoe_requests_total",
+    "Requests, by endpoint and status.",
+    ("endpoint", "status"),
+)
+q_table_lookups = metrics.counter(
+    "tictactoe_q_table_lookups_total",
+    "3x3 AI moves outside the book in states the Q-table has (hit) or has"
+    " never updated (miss).",
+    ("result",),
+)
+model_load_seconds = None
+
+
+agent = make_agent()
+checkpoint_log = CheckpointLog(resource_path(serving_model_file()))
+games = GameStore(lambda: TicTacToeGame(agent), MAX_GAMES, GAME_TTL)
+learner = None
+# set once loading the model has finished or failed (model_error); workers
+# answer "/" and board-only requests before that, AI moves wait for it
+model_ready = threading.Event()
+model_error = None
+
+
+def load_model():
+    global learner, model_load_seconds, model_error
+    start = time.perf_counter()
+    try:
+        # snapshot plus whatever online learning appended since
+        checkpoint_log.load(agent)
+        if USE_BOOK:
+            agent.book = get_book(resource_path(BOOK_FILE))
+        if ONLINE_LEARNING and agent.q_table is not None:
+            from online_learning import OnlineLearner
+
+            learner = OnlineLearner(agent, checkpoint_log.filename, log=checkpoint_log)
+    except Exception as e:
+        # AI moves answer 503 instead of waiting for a model that never comes
+        model_error = e
+        traceback.print_exc()
+    finally:
+        model_load_seconds = time.perf_counter() - start
+        model_ready.set()
+
+
+threading.Thread(target=load_model, daemon=True).start()
+
+metrics.gauge(
+    "tictactoe_active_games", "Games in the session store.", lambda: len(games)
+)
+metrics.gauge(
+    "tictactoe_model_ready",
+    "1 once the model is loaded.",
+    lambda: model_ready.is_set() and model_error is None,
+)
+metrics.gauge(
+    "tictactoe_model_load_seconds",
+    "Time it took to load the model, book and online learner.",
+    lambda: model_load_seconds or 0.0,
+)
+metrics.sampled_counter(
+    "tictactoe_book_lookups_total",
+    "Opening book / endgame tablebase lookups, by result.",
+    lambda: (
+        {(key,): value for key, value in agent.book.stats().items()}
+        if agent.book is not None
+        else {}
+    ),
+    ("result",),
+)
+
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+
+@app.after_request
+def remember_status(response):
+    g.status = response.status_code
+    return response
+
+
+@app.teardown_request
+def record_request(exc):
+    # also runs when an exception skipped after_request: that is a 500
+    start = g.get("start")
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or "unmatched"
+    request_seconds.observe(elapsed, endpoint)
+    overhead_seconds.observe(elapsed - g.get("decision_seconds", 0.0), endpoint)
+    requests_total.inc(endpoint, g.get("status", 500))
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.errorhandler(ModelUnavailable)
+def model_unavailable(e):
+    return jsonify({"success": False, "error": str(e)}), 503
 
 
 @app.route("/")
@@ -75,35 +276,78 @@ def index():
 
 @app.route("/make_move", methods=["POST"])
 def make_move():
-    move = int(request.json["move"])
-    state, _ = game.make_move(move)
-    game_over = game.check_game_end()
-
-    if not game_over:
-        ai_state, _ = game.ai_move()
+    try:
+        move = int(request.json["move"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"success": False, "error": "move must be a number"}), 400
+    game_id, game = games.get(request.json.get("game_id"))
+    if game.use_agent:
+        # before the human's move, so a 503 leaves the game unchanged
+        wait_for_model()
+    with game.lock:
+        error = game.invalid_move(move)
+        if error is not None:
+            return jsonify({"success": False, "error": error}), 400
+        state, _ = game.make_move(move)
         game_over = game.check_game_end()
-    else:
-        ai_state = state
+
+        if not game_over:
+            ai_state, _ = game.ai_move()
+            g.decision_seconds = game.decision_seconds
+            game_over = game.check_game_end()
+        else:
+            ai_state = state
+        current_player = "X" if game.current_player == game.human_player else "O"
+        if game_over and learner is not None and game.history:
+            learner.submit(game.history, game.ai_reward(), game.board.board_to_state())
+            game.history = []
 
     return jsonify(
         {
+            "game_id": game_id,
             "board": ai_state,
             "game_over": game_over,
-            "current_player": "X" if game.current_player == game.human_player else "O",
+            "current_player": current_player,
+            "rows": game.size[0],
+            "columns": game.size[1],
         }
     )
 
 
 @app.route("/reset_game", methods=["POST"])
 def reset_game():
-    game.reset_game()
+    data = request.get_json(silent=True) or {}
+    game_id, game = games.get(data.get("game_id"))
+    with game.lock:
+        # optional new size, e.g. {"rows": 15, "columns": 15, "k": 5}
+        try:
+            size = (
+                int(data.get("rows", game.size[0])),
+                int(data.get("columns", game.size[1])),
+                int(data.get("k", game.size[2])),
+            )
+            check_board_size(*size)
+        except (TypeError, ValueError) as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if size != game.size:
+            game.resize(*size)
+        game.reset_game()
+        board = game.get_board_state()
     return jsonify(
-        {"success": True, "board": game.get_board_state(), "current_player": "X"}
+        {
+            "success": True,
+            "game_id": game_id,
+            "board": board,
+            "current_player": "X",
+            "rows": size[0],
+            "columns": size[1],
+            "k": size[2],
+        }
     )
 
 
 if __name__ == "__main__":
-    if not os.path.exists(resource_path("q_table.pkl")):
+    if not os.path.exists(resource_path(serving_model_file())):
         # Train the AI if the model doesn't exist
         from game import TicTacToeGame as TrainingGame
 
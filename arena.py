@@ -0,0 +1,377 @@
+"""
+headless tournaments between strategies on 3x3, W/D/L matrix and Elo
+
+    python arena.py random perfect q_table.qtb q_table.pkl --games 100000
+    python arena.py q_table.qtb mcts:2000 replay:human_games.txt --workers 4
+    python arena.py --gate q_table.qtb --baseline q_table.pkl
+
+A strategy is "random", "perfect" (the solver), "mcts[:ITERATIONS]",
+"replay:FILE" (recorded human games, one game per line as the positions
+1-9 in play order; a recorded move is replayed when the position matches,
+otherwise a random one) or the path of any model file: *.qtb / *.pkl
+(dict table), *.npy (dense table), *.bin (policy file), *.npz (dqn).
+A file named like one backend's default model file (q_table_symmetric.qtb)
+is loaded by that backend; "BACKEND:PATH" (symmetric:old.qtb) picks one
+explicitly.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from transitions import tables
+
+# model file extension -> agents.make_agent backend
+BACKENDS = {
+    ".qtb": "dict",
+    ".pkl": "dict",
+    ".npy": "dense",
+    ".bin": "policy",
+    ".npz": "dqn",
+}
+
+
+class RandomStrategy:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def greedy_action(self, state, available_actions):
+        return self.rng.choice(available_actions)
+
+
+class ReplayStrategy:
+    """
+    plays the moves humans made in the same position, else random
+    """
+
+    def __init__(self, filename, seed=None):
+        self.rng = random.Random(seed)
+        self.moves = {}
+        with open(filename) as f:
+            for line in f:
+                state = [0] * 9
+                player = 1
+                for position in line.replace(",", " ").split():
+                    action = int(position) - 1
+                    self.moves.setdefault(tuple(state), []).append(action)
+                    state[action] = player
+                    player = -player
+
+    def greedy_action(self, state, available_actions):
+        moves = self.moves.get(tuple(state))
+        return self.rng.choice(moves if moves else available_actions)
+
+
+class MCTSStrategy:
+    def __init__(self, iterations, seed=None):
+        from mcts import MCTS
+
+        self.engine = MCTS(time_limit=None, iterations=iterations, seed=seed)
+
+    def greedy_action(self, state, available_actions):
+        from solver import state_to_bits
+
+        return self.engine.best_cell(*state_to_bits(state))
+
+
+def make_strategy(spec, seed=None):
+    """
+    object with greedy_action(state, available_actions) for a spec string
+    """
+    name, _, arg = spec.partition(":")
+    if spec == "random":
+        return RandomStrategy(seed)
+    elif spec == "perfect":
+        from solver import SolverAgent, get_solver
+
+        agent = SolverAgent()
+        agent.solver = get_solver()
+        return agent
+    elif name == "mcts":
+        return MCTSStrategy(int(arg or 1000), seed)
+    elif name == "replay":
+        return ReplayStrategy(arg, seed)
+
+    backend, path = model_backend(spec)
+    if backend is None or not os.path.exists(path):
+        raise ValueError(f"unknown strategy or missing model file: {spec}")
+    from agents import make_agent
+
+    agent = make_agent(backend, epsilon=0.0)
+    # load_model reports on stdout; keep the stream for results
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent.load_model(path)
+    return agent
+
+
+def model_backend(spec):
+    """
+    (backend, path) of a model file spec, backend None when unknown
+    """
+    from agents import MODEL_FILES
+
+    name, _, path = spec.partition(":")
+    if name in MODEL_FILES and path:
+        return name, path
+    # e.g. q_table_symmetric.qtb holds canonical keys only its backend reads
+    owners = [
+        backend
+        for backend, filename in MODEL_FILES.items()
+        if filename == os.path.basename(spec)
+    ]
+    if len(owners) == 1:
+        return owners[0], spec
+    return BACKENDS.get(os.path.splitext(spec)[1]), spec
+
+
+_STRATEGIES = {}
+
+
+def _play_chunk(task):
+    """
+    worker: num_games games of x_spec (X) against o_spec (O), stepped
+    through the transitions tables; returns (x_spec, o_spec, [X wins,
+    draws, O wins])
+    """
+    x_spec, o_spec, num_games, seed = task
+    random.seed(seed)
+    players = []
+    for spec in (x_spec, o_spec):
+        # built once per process, then kept for every later chunk
+        if spec not in _STRATEGIES:
+            _STRATEGIES[spec] = make_strategy(spec, seed)
+        players.append(_STRATEGIES[spec])
+    states, actions, _, successors, terminal, winner = tables()
+
+    results = [0, 0, 0]
+    for _ in range(num_games):
+        index, turn = 0, 0
+        while True:
+            action = players[turn].greedy_action(states[index], actions[index])
+            index = successors[index][action]
+            if terminal[index]:
+                break
+            turn ^= 1
+        results[1 - winner[index]] += 1  # X=1 -> 0, draw -> 1, O=-1 -> 2
+    return x_spec, o_spec, results
+
+
+def elo_ratings(scores, iterations=200):
+    """
+    Bradley-Terry fit of scores[a][b] = (points of a against b, games),
+    draws as half points, one virtual draw per pair so that perfect or
+    hopeless records stay finite; Elo with the mean at 0
+    """
+    players = list(scores)
+    strength = dict.fromkeys(players, 1.0)
+    for _ in range(iterations):
+        new = {}
+        for a in players:
+            points = games = 0.0
+            for b, (p, n) in scores[a].items():
+                points += p + 0.5
+                games += (n + 1) / (strength[a] + strength[b])
+            new[a] = points / games
+        # renormalise, only ratios matter
+        mean = math.exp(sum(math.log(s) for s in new.values()) / len(new))
+        strength = {a: s / mean for a, s in new.items()}
+    return {a: 400 * math.log10(s) for a, s in strength.items()}
+
+
+class Arena:
+    """
+    Round robin between strategy specs: every pair plays games_per_pair
+    games, half with each side as X, in chunks of chunk_size spread over
+    `workers` processes. Chunk results stream in as they finish (printed
+    to stderr, appended to `output` as JSON lines); counts[a][b] holds a's
+    [wins, draws, losses] against b.
+    """
+
+    def __init__(self, specs, games_per_pair=10000, workers=None, chunk_size=1000):
+        if len(set(specs)) != len(specs):
+            # results are keyed by spec, duplicates would merge
+            raise ValueError("strategies must be distinct")
+        self.specs = list(specs)
+        self.games_per_pair = games_per_pair
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.counts = {a: {b: [0, 0, 0] for b in specs if b != a} for a in specs}
+
+    def _tasks(self, seed):
+        rng = random.Random(seed)
+        tasks = []
+        for i, a in enumerate(self.specs):
+            for b in self.specs[i + 1 :]:
+                for x_spec, o_spec, games in (
+                    (a, b, self.games_per_pair // 2),
+                    (b, a, self.games_per_pair - self.games_per_pair // 2),
+                ):
+                    while games > 0:
+                        n = min(games, self.chunk_size)
+                        tasks.append((x_spec, o_spec, n, rng.randrange(2**32)))
+                        games -= n
+        return tasks
+
+    def _record(self, x_spec, o_spec, results):
+        x_wins, draws, o_wins = results
+        for own, other, row in (
+            (x_spec, o_spec, (x_wins, draws, o_wins)),
+            (o_spec, x_spec, (o_wins, draws, x_wins)),
+        ):
+            counts = self.counts[own][other]
+            for i, n in enumerate(row):
+                counts[i] += n
+
+    def run(self, output=None, seed=None, quiet=False):
+        tasks = self._tasks(seed)
+        total = sum(task[2] for task in tasks)
+        played = 0
+        start = time.perf_counter()
+        stream = open(output, "a") if output else None
+        try:
+            if self.workers > 1:
+                pool = multiprocessing.Pool(self.workers)
+                results = pool.imap_unordered(_play_chunk, tasks)
+            else:
+                pool = None
+                results = map(_play_chunk, tasks)
+            for x_spec, o_spec, result in results:
+                self._record(x_spec, o_spec, result)
+                played += sum(result)
+                if stream is not None:
+                    row = {"x": x_spec, "o": o_spec}
+                    row.update(zip(("x_win", "draw", "o_win"), result))
+                    stream.write(json.dumps(row) + "\n")
+                    stream.flush()
+                if not quiet:
+                    rate = played / (time.perf_counter() - start)
+                    print(
+                        f"\r{played}/{total} games, {rate:,.0f} games/sec",
+                        end="",
+                        file=sys.stderr,
+                    )
+            if pool is not None:
+                pool.close()
+                pool.join()
+        finally:
+            if stream is not None:
+                stream.close()
+        if not quiet:
+            print(file=sys.stderr)
+        return self.counts
+
+    def rates(self, a, b):
+        """
+        a's (win, draw, loss) rates against b
+        """
+        counts = self.counts[a][b]
+        games = sum(counts) or 1
+        return tuple(n / games for n in counts)
+
+    def elo(self):
+        return elo_ratings(
+            {
+                a: {b: (w + d / 2, w + d + l) for b, (w, d, l) in row.items()}
+                for a, row in self.counts.items()
+            }
+        )
+
+    def report(self):
+        """
+        W/D/L matrix (row against column) and Elo, as text
+        """
+        width = max(12, max(len(spec) for spec in self.specs) + 2)
+        lines = ["".ljust(width) + "".join(b.rjust(width) for b in self.specs)]
+        for a in self.specs:
+            cells = []
+            for b in self.specs:
+                if a == b:
+                    cells.append("-".rjust(width))
+                else:
+                    w, d, l = self.counts[a][b]
+                    cells.append(f"{w}/{d}/{l}".rjust(width))
+            lines.append(a.ljust(width) + "".join(cells))
+        lines.append("")
+        for spec, rating in sorted(self.elo().items(), key=lambda kv: -kv[1]):
+            lines.append(f"{spec.ljust(width)}{rating:8.0f}")
+        return "\n".join(lines)
+
+
+def _same_model(a, b):
+    (backend_a, path_a), (backend_b, path_b) = model_backend(a), model_backend(b)
+    return backend_a == backend_b and os.path.abspath(path_a) == os.path.abspath(path_b)
+
+
+def gate(candidate, baseline=None, games=2000, workers=None, max_loss=0.0, margin=0.02):
+    """
+    regression gate for a model file: it may lose at most max_loss of its
+    games to perfect play and to random play and, with a baseline, must
+    score at least 0.5 - margin against it
+    returns (passed, messages)
+    """
+    if baseline and _same_model(candidate, baseline):
+        raise ValueError(f"{candidate} cannot be gated against itself")
+    specs = ["random", "perfect", candidate]
+    if baseline:
+        specs.append(baseline)
+    arena = Arena(specs, games, workers)
+    arena.run(quiet=True)
+    passed = True
+    messages = []
+    for opponent in specs[:2]:
+        win, draw, loss = arena.rates(candidate, opponent)
+        ok = loss <= max_loss
+        passed = passed and ok
+        messages.append(
+            f"{'ok  ' if ok else 'FAIL'} vs {opponent}: "
+            f"win {win:.1%} draw {draw:.1%} loss {loss:.1%} (max {max_loss:.1%})"
+        )
+    if baseline:
+        win, draw, loss = arena.rates(candidate, baseline)
+        score = win + draw / 2
+        ok = score >= 0.5 - margin
+        passed = passed and ok
+        messages.append(
+            f"{'ok  ' if ok else 'FAIL'} vs {baseline}: score {score:.3f} "
+            f"(min {0.5 - margin:.3f})"
+        )
+    return passed, messages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe arena")
+    parser.add_argument("strategies", nargs="*", default=["random", "perfect"])
+    parser.add_argument("--games", type=int, default=10000, help="games per pair")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--output", default=None, help="stream chunks to .jsonl")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--gate", default=None, help="model file to check")
+    parser.add_argument("--baseline", default=None, help="model file to beat")
+    parser.add_argument(
+        "--max-loss",
+        type=float,
+        default=0.0,
+        help="highest loss rate the gate allows against random / perfect",
+    )
+    args = parser.parse_args()
+
+    try:
+        if args.gate:
+            passed, messages = gate(
+                args.gate, args.baseline, args.games, args.workers, args.max_loss
+            )
+            print("\n".join(messages))
+            sys.exit(0 if passed else 1)
+        arena = Arena(args.strategies, args.games, args.workers, args.chunk_size)
+    except ValueError as e:
+        parser.error(str(e))
+    arena.run(args.output, args.seed)
+    print(arena.report())
@@ -0,0 +1,310 @@
+"""
+asyncio serving mode: same JSON contract as app.py, AI moves resolved in
+micro-batches with one vectorized Q-table lookup; 3x3 only, other board
+sizes are refused with a 400
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from agents import make_agent, serving_model_file
+from bitboard import BitBoard
+from dense_q import LEGAL, random_argmax
+from sessions import GameStore
+
+MAX_BATCH = int(os.environ.get("TICTACTOE_MAX_BATCH", "256"))
+MAX_DELAY = float(os.environ.get("TICTACTOE_BATCH_DELAY", "0.002"))
+MAX_GAMES = int(os.environ.get("TICTACTOE_MAX_GAMES", "10000"))
+GAME_TTL = float(os.environ.get("TICTACTOE_GAME_TTL", "3600"))
+
+
+class MoveBatcher:
+    """
+    Collects pending AI-move requests and answers them together: a batch
+    is resolved when max_batch requests are waiting or max_delay seconds
+    after the first one arrived, whichever comes first.
+    """
+
+    def __init__(self, agent, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.agent = agent
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.rng = np.random.default_rng()
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+
+    async def best_move(self, index):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((index, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_delay, self._flush
+            )
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        indices = np.fromiter((index for index, _ in pending), dtype=np.int64)
+        actions = random_argmax(self.agent.masked_rows(indices), self.rng)
+        # same epsilon exploration as QLearningAgent.choose_action
+        explore = self.rng.random(len(indices)) < self.agent.epsilon
+        if explore.any():
+            scores = np.where(LEGAL[indices], self.rng.random((len(indices), 9)), -1)
+            actions = np.where(explore, scores.argmax(axis=1), actions)
+        self.batches += 1
+        for (_, future), action in zip(pending, actions.tolist()):
+            if not future.done():
+                future.set_result(action)
+
+
+class AsyncGame:
+    def __init__(self):
+        self.board = BitBoard()
+
+    def get_board_state(self):
+        return [
+            (
+                "X"
+                if cell == BitBoard.PLAYER_X
+                else "O" if cell == BitBoard.PLAYER_O else ""
+            )
+            for cell in self.board.board_to_state()
+        ]
+
+    def check_game_end(self):
+        if self.board.check_winner("X"):
+            return "You win!"
+        elif self.board.check_winner("O"):
+            return "AI wins!"
+        elif self.board.check_is_tie():
+            return "It's a tie!"
+        return None
+
+
+# the batcher needs a Q array, so serve from the dense backend
+agent = make_agent("dense")
+agent.load_model(serving_model_file("dense"))
+batcher = MoveBatcher(agent)
+games = GameStore(AsyncGame, MAX_GAMES, GAME_TTL, lock_factory=asyncio.Lock)
+
+_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+with open(os.path.join(_TEMPLATE, "index.html"), "rb") as f:
+    INDEX_HTML = f.read()
+
+
+async def make_move(data):
+    move = int(data["move"])
+    if not 1 <= move <= 9:
+        raise ValueError("move must be between 1 and 9")
+    game_id, game = games.get(data.get("game_id"))
+    async with game.lock:
+        if game.check_game_end() is not None:
+            raise ValueError("game is over")
+        if game.board.board_to_state()[move - 1] != BitBoard.EMPTY_CELL:
+            raise ValueError("cell is already taken")
+        game.board.step(move, "X")
+        game_over = game.check_game_end()
+        current_player = "O"
+        if not game_over:
+            action = await batcher.best_move(game.board.state_index())
+            game.board.step(action + 1, "O")
+            game_over = game.check_game_end()
+            current_player = "X"
+        return {
+            "game_id": game_id,
+            "board": game.get_board_state(),
+            "game_over": game_over,
+            "current_player": current_player,
+            "rows": 3,
+            "columns": 3,
+        }
+
+
+async def reset_game(data):
+    # the batcher reads a 3x3 Q array; the page keeps its board on a refusal
+    size = (
+        int(data.get("rows", 3)),
+        int(data.get("columns", 3)),
+        int(data.get("k", 3)),
+    )
+    if size != (3, 3, 3):
+        raise ValueError("this server only plays 3x3 boards")
+    game_id, game = games.get(data.get("game_id"))
+    async with game.lock:
+        game.board.reset_board()
+        board = game.get_board_state()
+    return {
+        "success": True,
+        "game_id": game_id,
+        "board": board,
+        "current_player": "X",
+        "rows": 3,
+        "columns": 3,
+        "k": 3,
+    }
+
+
+ROUTES = {"/make_move": make_move, "/reset_game": reset_game}
+
+
+async def _send(send, status, body, content_type):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    path, method = scope["path"], scope["method"]
+    if path == "/" and method == "GET":
+        await _send(send, 200, INDEX_HTML, b"text/html; charset=utf-8")
+    elif path in ROUTES and method == "POST":
+        try:
+            data = json.loads(body or b"{}")
+            result = await ROUTES[path](data)
+        except (KeyError, ValueError, TypeError) as e:
+            error = str(e) if isinstance(e, ValueError) else "bad request"
+            body = json.dumps({"success": False, "error": error}).encode()
+            await _send(send, 400, body, b"application/json")
+            return
+        await _send(send, 200, json.dumps(result).encode(), b"application/json")
+    else:
+        await _send(send, 404, b'{"error": "not found"}', b"application/json")
+
+
+async def _call(path, payload):
+    """
+    one in-process ASGI request, used by the benchmark
+    """
+    sent = []
+    body = json.dumps(payload).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": path, "method": "POST", "headers": []}
+    await app(scope, receive, send)
+    return json.loads(sent[-1]["body"])
+
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    return (
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+    )
+
+
+def benchmark(num_clients=500, num_threads=8):
+    """
+    num_clients players each play one game with random moves: concurrently
+    against this app in one event loop, and against app.py through Flask's
+    test client on num_threads threads (like gunicorn --threads)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    async def async_player(seed, latencies):
+        rng = random.Random(seed)
+        data = await _call("/reset_game", {})
+        while not data.get("game_over"):
+            empty = [i for i, cell in enumerate(data["board"]) if cell == ""]
+            start = time.perf_counter()
+            data = await _call(
+                "/make_move",
+                {"game_id": data["game_id"], "move": rng.choice(empty) + 1},
+            )
+            latencies.append(time.perf_counter() - start)
+
+    async def run_async():
+        latencies = []
+        await asyncio.gather(*(async_player(i, latencies) for i in range(num_clients)))
+        return latencies
+
+    start = time.perf_counter()
+    async_latencies = asyncio.run(run_async())
+    async_elapsed = time.perf_counter() - start
+
+    from app import app as flask_app
+
+    def flask_player(seed):
+        rng = random.Random(seed)
+        client = flask_app.test_client()
+        data = client.post("/reset_game", json={}).get_json()
+        latencies = []
+        while not data.get("game_over"):
+            empty = [i for i, cell in enumerate(data["board"]) if cell == ""]
+            start = time.perf_counter()
+            data = client.post(
+                "/make_move",
+                json={"game_id": data["game_id"], "move": rng.choice(empty) + 1},
+            ).get_json()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(num_threads) as pool:
+        flask_latencies = [
+            latency
+            for latencies in pool.map(flask_player, range(num_clients))
+            for latency in latencies
+        ]
+    flask_elapsed = time.perf_counter() - start
+
+    for name, latencies, elapsed in (
+        ("asgi", async_latencies, async_elapsed),
+        ("flask", flask_latencies, flask_elapsed),
+    ):
+        p50, p99 = _percentiles(latencies)
+        print(
+            f"{name:>5}: p50 {p50:.2f} ms, p99 {p99:.2f} ms, "
+            f"{len(latencies) / elapsed:,.0f} moves/sec"
+        )
+    print(f"asgi batches: {batcher.batches}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,175 @@
+import time
+
+import numpy as np
+
+from board import Board, index_to_state
+from dense_q import _POW3, LEGAL, random_argmax
+
+WIN_LINES = np.array(
+    [
+        [0, 1, 2],
+        [3, 4, 5],
+        [6, 7, 8],
+        [0, 3, 6],
+        [1, 4, 7],
+        [2, 5, 8],
+        [0, 4, 8],
+        [2, 4, 6],
+    ]
+)
+# boards @ LINE_MATRIX -> per-line sums, +3 / -3 is a full line for X / O
+LINE_MATRIX = np.zeros((9, 8), dtype=np.int8)
+LINE_MATRIX[WIN_LINES, np.arange(8)[:, None]] = 1
+
+
+class BatchSelfPlayEnv:
+    """
+    num_envs self-play games stepped in lockstep on (num_envs, 9) arrays.
+    Cells use Board.PLAYER_X / PLAYER_O / EMPTY_CELL, X always starts, and
+    finished games are reset in place.
+
+    Each game's history is kept as state ids and actions per ply, so a
+    finished game can be replayed as the (state, action, player) list that
+    train.update_from_history expects (see to_game_histories).
+    """
+
+    def __init__(self, num_envs=1024, epsilon=0.1, seed=None):
+        self.num_envs = num_envs
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+        self._envs = np.arange(num_envs)
+        self.boards = np.zeros((num_envs, 9), dtype=np.int8)
+        self.player = np.full(num_envs, Board.PLAYER_X, dtype=np.int8)
+        self.plies = np.zeros(num_envs, dtype=np.int64)
+        self.index = np.zeros(num_envs, dtype=np.int64)
+        self.history_index = np.zeros((num_envs, 9), dtype=np.int64)
+        self.history_action = np.zeros((num_envs, 9), dtype=np.int64)
+
+    def select_actions(self, agent):
+        """
+        epsilon-greedy for the whole batch from agent.masked_rows
+        (a DenseQLearningAgent)
+        """
+        greedy = random_argmax(agent.masked_rows(self.index), self.rng)
+        # random legal move: highest random score among empty cells
+        scores = np.where(LEGAL[self.index], self.rng.random((self.num_envs, 9)), -1)
+        explore = self.rng.random(self.num_envs) < self.epsilon
+        return np.where(explore, scores.argmax(axis=1), greedy)
+
+    def step(self, actions):
+        """
+        apply one action per game; returns the games that just ended as
+        (history_index, history_action, plies, winner, terminal_index),
+        winner is PLAYER_X, PLAYER_O or 0 for a tie
+        """
+        envs = self._envs
+        self.history_index[envs, self.plies] = self.index
+        self.history_action[envs, self.plies] = actions
+        self.boards[envs, actions] = self.player
+        self.index += (self.player % 3) * _POW3[actions]
+        self.plies += 1
+
+        # only the player who just moved can have completed a line
+        line_sums = self.boards @ LINE_MATRIX
+        won = (line_sums * self.player[:, None] == 3).any(axis=1)
+        done = won | (self.plies == 9)
+
+        finished = np.flatnonzero(done)
+        result = (
+            self.history_index[finished].copy(),
+            self.history_action[finished].copy(),
+            self.plies[finished].copy(),
+            np.where(won[finished], self.player[finished], 0),
+            self.index[finished].copy(),
+        )
+
+        self.player = -self.player
+        self.boards[finished] = Board.EMPTY_CELL
+        self.player[finished] = Board.PLAYER_X
+        self.plies[finished] = 0
+        self.index[finished] = 0
+        return result
+
+
+def to_game_histories(finished):
+    """
+    yield (game_history, final_reward, terminal_state) per finished game,
+    the same values play_self_training_game / update_from_history use
+    """
+    history_index, history_action, plies, winner, terminal_index = finished
+    for g in range(len(plies)):
+        game_history = [
+            (
+                index_to_state(int(history_index[g, p])),
+                int(history_action[g, p]),
+                Board.PLAYER_X if p % 2 == 0 else Board.PLAYER_O,
+            )
+            for p in range(int(plies[g]))
+        ]
+        yield game_history, int(winner[g]), index_to_state(int(terminal_index[g]))
+
+
+def batch_update(agent, finished):
+    """
+    vectorized update_from_history for a DenseQLearningAgent: plies are
+    applied last to first as in the sequential loop, all games at once.
+    If two games touch the same (state, action) at the same ply only the
+    last write is kept.
+    """
+    history_index, history_action, plies, winner, terminal_index = finished
+    next_max_q = agent.masked_rows(terminal_index).max(axis=1)
+    next_max_q[np.isneginf(next_max_q)] = 0.0
+
+    for p in range(8, -1, -1):
+        games = np.flatnonzero(plies > p)
+        if not len(games):
+            continue
+        mover = Board.PLAYER_X if p % 2 == 0 else Board.PLAYER_O
+        reward = winner[games] * mover * agent.gamma ** (plies[games] - 1 - p)
+        cell = agent._cell(history_index[games, p], history_action[games, p])
+        old_q = agent.q_table[cell]
+        agent.q_table[cell] = old_q + agent.alpha * (
+            reward + agent.gamma * next_max_q[games] - old_q
+        )
+
+
+def train_with_batch_self_play(agent, num_games=100000, num_envs=4096, save=True):
+    """
+    train_with_self_play on a BatchSelfPlayEnv (DenseQLearningAgent only)
+    """
+    env = BatchSelfPlayEnv(num_envs, agent.epsilon)
+    played = 0
+    total_reward = 0
+    while played < num_games:
+        finished = env.step(env.select_actions(agent))
+        if len(finished[2]):
+            batch_update(agent, finished)
+            played += len(finished[2])
+            total_reward += int(finished[3].sum())
+
+    if save:
+        agent.save_model()
+    print(total_reward / played)
+
+
+def benchmark(num_games=200000, num_envs=4096):
+    from dense_q import DenseQLearningAgent
+    from train import train_with_self_play
+
+    agent = DenseQLearningAgent()
+    start = time.perf_counter()
+    train_with_batch_self_play(agent, num_games, num_envs, save=False)
+    batch_rate = num_games / (time.perf_counter() - start)
+
+    serial_games = num_games // 20
+    agent = DenseQLearningAgent()
+    start = time.perf_counter()
+    train_with_self_play(agent, serial_games, use_bitboard=True, save=False)
+    serial_rate = serial_games / (time.perf_counter() - start)
+
+    print(f"serial: {serial_rate:,.0f} games/sec")
+    print(f" batch: {batch_rate:,.0f} games/sec ({batch_rate / serial_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    benchmark()
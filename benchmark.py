@@ -0,0 +1,458 @@
+"""
+micro benchmarks for the self-play / serving hot paths, JSON on stdout
+
+    python benchmark.py                        # every case
+    python benchmark.py --only step update_q_table --bitboard
+    python benchmark.py --output bench.json --profile --top 20
+    python benchmark.py --startup              # cold start of each front end
+"""
+
+import argparse
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import pstats
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from agents import MODEL_FILES, Q_BACKEND, make_agent
+from bitboard import make_board
+from board import Board
+from train import play_self_training_game, train_with_self_play, update_from_history
+from transitions import legal_actions
+
+
+def _random_games(num_games, seed=0):
+    """
+    move sequences (actions 0-8) of random games played to the end
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(num_games):
+        board = Board()
+        marker, moves = "X", []
+        while True:
+            state = board.board_to_state()
+            action = rng.choice(legal_actions(state))
+            moves.append(action)
+            _, _, done, _ = board.step(action + 1, marker)
+            if done:
+                break
+            marker = "O" if marker == "X" else "X"
+        games.append(moves)
+    return games
+
+
+def _positions(games, use_bitboard):
+    """
+    one board per prefix of every game, i.e. every position the games passed
+    """
+    boards = []
+    for moves in games:
+        for length in range(len(moves)):
+            board = make_board(use_bitboard)
+            for i, action in enumerate(moves[:length]):
+                board.step(action + 1, "X" if i % 2 == 0 else "O")
+            boards.append(board)
+    return boards
+
+
+def _trained_agent(backend):
+    agent = make_agent(backend)
+    if os.path.exists(MODEL_FILES[backend]):
+        agent.load_model(MODEL_FILES[backend])
+    else:
+        train_with_self_play(agent, 2000, save=False)
+    return agent
+
+
+# each case takes the options and returns run(), which does the work once
+# and returns how many operations it did
+
+
+def case_step(options):
+    games = _random_games(options.size)
+    board = make_board(options.bitboard)
+
+    def run():
+        ops = 0
+        for moves in games:
+            board.reset_board()
+            for i, action in enumerate(moves):
+                board.step(action + 1, "X" if i % 2 == 0 else "O")
+            ops += len(moves)
+        return ops
+
+    return run
+
+
+def case_check_winner(options):
+    boards = _positions(_random_games(options.size // 10), options.bitboard)
+
+    def run():
+        for board in boards:
+            board.check_winner("X")
+            board.check_winner("O")
+        return 2 * len(boards)
+
+    return run
+
+
+def case_board_to_state(options):
+    boards = _positions(_random_games(options.size // 10), options.bitboard)
+
+    def run():
+        for board in boards:
+            board.board_to_state()
+        return len(boards)
+
+    return run
+
+
+def _agent_inputs(options):
+    boards = _positions(_random_games(options.size // 10), options.bitboard)
+    states = [board.board_to_state() for board in boards]
+    available = [legal_actions(s) for s in states]
+    return states, available
+
+
+def case_legal_actions(options):
+    boards = _positions(_random_games(options.size // 10), options.bitboard)
+    states = [board.board_to_state() for board in boards]
+    legal_actions(states[0])  # build the tables outside the timing
+
+    def run():
+        for state in states:
+            legal_actions(state)
+        return len(states)
+
+    return run
+
+
+def case_choose_action(options):
+    agent = _trained_agent(options.backend)
+    states, available = _agent_inputs(options)
+
+    def run():
+        for state, actions in zip(states, available):
+            agent.choose_action(state, actions)
+        return len(states)
+
+    return run
+
+
+def case_update_q_table(options):
+    agent = _trained_agent(options.backend)
+    states, available = _agent_inputs(options)
+    # (state, action) -> the position after playing it
+    inputs = []
+    for state, actions in zip(states, available):
+        action = actions[0]
+        next_state = list(state)
+        next_state[action] = Board.PLAYER_X if len(actions) % 2 else Board.PLAYER_O
+        next_available = [i for i in actions if i != action]
+        inputs.append((state, action, next_state, next_available))
+
+    def run():
+        for state, action, next_state, next_available in inputs:
+            agent.update_q_table(state, action, 0, next_state, next_available)
+        return len(inputs)
+
+    return run
+
+
+def case_play_self_training_game(options):
+    agent = _trained_agent(options.backend)
+    board = make_board(options.bitboard)
+    num_games = options.size // 10
+
+    def run():
+        for _ in range(num_games):
+            board.reset_board()
+            play_self_training_game(agent, board)
+        return num_games
+
+    return run
+
+
+def case_training(options):
+    """
+    games/sec of full self-play training (play + update), without tqdm
+    """
+    agent = _trained_agent(options.backend)
+    board = make_board(options.bitboard)
+    num_games = options.size // 10
+
+    def run():
+        for _ in range(num_games):
+            board.reset_board()
+            game_history, final_reward = play_self_training_game(agent, board)
+            update_from_history(
+                agent, game_history, final_reward, board.board_to_state()
+            )
+        return num_games
+
+    return run
+
+
+def case_save_model(options):
+    agent = _trained_agent(options.backend)
+    ext = os.path.splitext(MODEL_FILES[options.backend])[1]
+    filename = os.path.join(tempfile.mkdtemp(), "bench" + ext)
+
+    def run():
+        agent.save_model(filename)
+        return 1
+
+    return run
+
+
+def case_load_model(options):
+    agent = _trained_agent(options.backend)
+    ext = os.path.splitext(MODEL_FILES[options.backend])[1]
+    filename = os.path.join(tempfile.mkdtemp(), "bench" + ext)
+    agent.save_model(filename)
+    fresh = make_agent(options.backend)
+
+    def run():
+        fresh.load_model(filename)
+        return 1
+
+    return run
+
+
+def case_make_move(options):
+    """
+    /make_move through Flask's test client; run() records each request's
+    latency in run.latencies
+    """
+    from app import app
+
+    client = app.test_client()
+    rng = random.Random(0)
+    num_games = max(1, options.size // 20)
+
+    def run():
+        latencies = run.latencies = []
+        for _ in range(num_games):
+            data = client.post("/reset_game", json={}).get_json()
+            while not data.get("game_over"):
+                empty = [i for i, cell in enumerate(data["board"]) if cell == ""]
+                payload = {"game_id": data["game_id"], "move": rng.choice(empty) + 1}
+                start = time.perf_counter()
+                data = client.post("/make_move", json=payload).get_json()
+                latencies.append(time.perf_counter() - start)
+        return len(latencies)
+
+    return run
+
+
+CASES = {
+    "step": case_step,
+    "check_winner": case_check_winner,
+    "board_to_state": case_board_to_state,
+    "legal_actions": case_legal_actions,
+    "choose_action": case_choose_action,
+    "update_q_table": case_update_q_table,
+    "play_self_training_game": case_play_self_training_game,
+    "training": case_training,
+    "save_model": case_save_model,
+    "load_model": case_load_model,
+    "make_move": case_make_move,
+}
+
+
+# cold start scripts, each run in a fresh interpreter: seconds spent
+# importing the front end and until its first AI move is known
+_STARTUP_PRELUDE = """
+import json, time
+start = time.perf_counter()
+"""
+STARTUP = {
+    "cli": """
+import game
+imported = time.perf_counter()
+from board import Board
+g = game.TicTacToeGame()
+g.load_model()
+player = game.Player(is_human=False, use_rl=True, q_table=g.agent.q_table, agent=g.agent)
+player.get_move(Board())
+""",
+    "web": """
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+data = client.post("/reset_game", json={}).get_json()
+client.post("/make_move", json={"game_id": data["game_id"], "move": 1})
+""",
+    "gui": """
+import main_gui
+imported = time.perf_counter()
+qt = main_gui.QApplication([])
+window = main_gui.TicTacToeGUI()
+window.show()
+window.on_button_click(0, 0)
+window.pool.waitForDone()
+qt.processEvents()  # delivers the queued move
+""",
+}
+_STARTUP_RESULT = """
+done = time.perf_counter()
+print(json.dumps({"import_s": imported - start, "first_move_s": done - start}))
+"""
+
+
+def run_startup(name, options):
+    """
+    best of options.repeat fresh interpreters; process_s also counts the
+    interpreter's own start-up and exit
+    """
+    script = _STARTUP_PRELUDE + STARTUP[name] + _STARTUP_RESULT
+    # the GUI never needs a display to be measured
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    best = None
+    for _ in range(options.repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines() or ["failed"]
+            return {"error": lines[-1]}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["process_s"] = elapsed
+        if best is None or result["first_move_s"] < best["first_move_s"]:
+            best = result
+    return {key: round(value, 4) for key, value in best.items()}
+
+
+def _top_functions(profile, top):
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append(
+            {
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": calls,
+                "tottime": round(tottime, 6),
+                "cumtime": round(cumtime, 6),
+            }
+        )
+    rows.sort(key=lambda row: row["tottime"], reverse=True)
+    return rows[:top]
+
+
+def run_case(name, options):
+    """
+    best of options.repeat runs; with options.profile one extra profiled run
+    whose top functions (by own time) are added to the result
+    """
+    run = CASES[name](options)
+    run()  # warm up caches and lazily built tables
+    best = None
+    for _ in range(options.repeat):
+        start = time.perf_counter()
+        ops = run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[1]:
+            best = ops, elapsed, getattr(run, "latencies", None)
+    ops, elapsed, latencies = best
+    result = {
+        "ops": ops,
+        "seconds": round(elapsed, 6),
+        "ops_per_sec": round(ops / elapsed, 1),
+        "us_per_op": round(elapsed / ops * 1e6, 3),
+    }
+    if latencies:
+        latencies = sorted(latencies)
+        result["p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 3)
+        result["p99_ms"] = round(latencies[int(len(latencies) * 0.99)] * 1000, 3)
+
+    if options.profile:
+        profile = cProfile.Profile()
+        profile.runcall(run)
+        result["profile"] = _top_functions(profile, options.top)
+        if options.profile_dir:
+            os.makedirs(options.profile_dir, exist_ok=True)
+            profile.dump_stats(os.path.join(options.profile_dir, f"{name}.prof"))
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), default=None)
+    parser.add_argument("--backend", default=Q_BACKEND, choices=sorted(MODEL_FILES))
+    parser.add_argument("--bitboard", action="store_true")
+    parser.add_argument(
+        "--size", type=int, default=2000, help="work per run (games, roughly)"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument(
+        "--profile", action="store_true", help="add cProfile's top functions"
+    )
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--profile-dir", help="also dump <case>.prof files here")
+    parser.add_argument(
+        "--startup",
+        nargs="*",
+        choices=sorted(STARTUP),
+        default=None,
+        help="time cold starts of the front ends (all without names)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": options.backend,
+        "bitboard": options.bitboard,
+        "size": options.size,
+        "repeat": options.repeat,
+        "results": {},
+    }
+    if options.startup is not None:
+        for name in options.startup or STARTUP:
+            result = report["results"][name] = run_startup(name, options)
+            summary = result.get("error") or (
+                f"import {result['import_s']:.3f}s, "
+                f"first move {result['first_move_s']:.3f}s"
+            )
+            print(f"{name:>24}: {summary}", file=sys.stderr)
+        names = options.only or ()
+    else:
+        names = options.only or CASES
+    for name in names:
+        # load_model and friends print status lines, keep stdout for the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            report["results"][name] = run_case(name, options)
+        print(
+            f"{name:>24}: {report['results'][name]['ops_per_sec']:>14,.0f} ops/sec",
+            file=sys.stderr,
+        )
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import random
+import time
+
+from board import Board
+
+# cell index (0-8) -> bit, row-major like board_to_state()
+WIN_MASKS = (
+    0b000000111,
+    0b000111000,
+    0b111000000,
+    0b001001001,
+    0b010010010,
+    0b100100100,
+    0b100010001,
+    0b001010100,
+)
+FULL_MASK = 0b111111111
+
+# WINNING[bits] is True when the 9-bit occupancy contains a full line
+WINNING = tuple(
+    any(bits & mask == mask for mask in WIN_MASKS) for bits in range(FULL_MASK + 1)
+)
+
+# base-3 weight of each occupancy pattern, see board.state_index
+_BASE3 = tuple(
+    sum(3**i for i in range(9) if bits >> i & 1) for bits in range(FULL_MASK + 1)
+)
+
+_STATE_CACHE = {}
+
+
+class BitBoard(Board):
+    """
+    Compact board: one 9-bit integer per player instead of a 3x3 list.
+    step() keeps the same (next_state, reward, done, info) contract as Board.
+    """
+
+    def reset_board(self):
+        self.x_bits = 0
+        self.o_bits = 0
+
+    @property
+    def game_board(self):
+        # compatibility view for callers that index game_board[row][col]
+        state = self.board_to_state()
+        return [list(state[i : i + 3]) for i in range(0, 9, 3)]
+
+    def step(self, move, player_marker):
+        cell = move - 1 if isinstance(move, int) else move.value - 1
+        bit = 1 << cell
+
+        if (self.x_bits | self.o_bits) & bit:
+            return self.board_to_state(), -10, False, {}
+
+        if player_marker == "X":
+            self.x_bits |= bit
+            bits = self.x_bits
+        else:
+            self.o_bits |= bit
+            bits = self.o_bits
+        next_state = self.board_to_state()
+
+        if WINNING[bits]:
+            return next_state, 1, True, {}
+        elif (self.x_bits | self.o_bits) == FULL_MASK:
+            return next_state, 0, True, {}
+        else:
+            return next_state, 0, False, {}
+
+    def check_winner(self, player_marker):
+        return WINNING[self.x_bits if player_marker == "X" else self.o_bits]
+
+    def check_is_tie(self):
+        return (self.x_bits | self.o_bits) == FULL_MASK
+
+    def set_state(self, state):
+        self.x_bits = sum(
+            1 << i for i, cell in enumerate(state) if cell == self.PLAYER_X
+        )
+        self.o_bits = sum(
+            1 << i for i, cell in enumerate(state) if cell == self.PLAYER_O
+        )
+
+    def state_key(self):
+        return self.x_bits | (self.o_bits << 9)
+
+    def state_index(self):
+        return _BASE3[self.x_bits] + 2 * _BASE3[self.o_bits]
+
+    def board_to_state(self):
+        # cached immutable tuple, shared by every board in the same position
+        key = self.x_bits | (self.o_bits << 9)
+        state = _STATE_CACHE.get(key)
+        if state is None:
+            state = tuple(
+                (
+                    self.PLAYER_X
+                    if self.x_bits >> i & 1
+                    else self.PLAYER_O if self.o_bits >> i & 1 else self.EMPTY_CELL
+                )
+                for i in range(9)
+            )
+            _STATE_CACHE[key] = state
+        return state
+
+
+def make_board(use_bitboard=False, rows=3, columns=3, k=3):
+    """
+    any size other than 3x3 / 3 in a row is a grid_board.GridBoard
+    """
+    if (rows, columns, k) != (3, 3, 3):
+        from grid_board import GridBoard
+
+        return GridBoard(rows, columns, k)
+    return BitBoard() if use_bitboard else Board()
+
+
+def benchmark(num_games=20000, seed=0):
+    """
+    random games on both boards, same move sequence
+    """
+    results = {}
+    for name, board in (("list", Board()), ("bitboard", BitBoard())):
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        for _ in range(num_games):
+            board.reset_board()
+            marker = "X"
+            while True:
+                state = board.board_to_state()
+                move = rng.choice([i for i in range(9) if state[i] == Board.EMPTY_CELL])
+                _, _, done, _ = board.step(move + 1, marker)
+                if done:
+                    break
+                marker = "O" if marker == "X" else "X"
+        elapsed = time.perf_counter() - start
+        results[name] = num_games / elapsed
+        print(f"{name:>8}: {num_games / elapsed:,.0f} games/sec")
+    print(f"speedup: {results['bitboard'] / results['list']:.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
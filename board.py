@@ -73,3 +73,31 @@ class Board:
     def board_to_state(self):
         # flatten
         return [cell for row in self.game_board for cell in row]
+
+    def set_state(self, state):
+        """
+        inverse of board_to_state
+        """
+        self.game_board = [list(state[i : i + 3]) for i in range(0, 9, 3)]
+
+
+NUM_STATES = 3**9
+_DIGIT_CELL = (Board.EMPTY_CELL, Board.PLAYER_X, Board.PLAYER_O)
+
+
+def state_index(state):
+    """
+    base-3 id of a flattened state, cell i has weight 3**i (empty=0, X=1, O=2)
+    """
+    index = 0
+    for cell in reversed(state):
+        index = index * 3 + cell % 3  # -1 % 3 == 2
+    return index
+
+
+def index_to_state(index):
+    state = []
+    for _ in range(9):
+        index, digit = divmod(index, 3)
+        state.append(_DIGIT_CELL[digit])
+    return state
@@ -0,0 +1,152 @@
+import os
+import random
+import struct
+import threading
+
+from board import state_index
+from symmetry import canonicalize
+from transitions import legal_actions
+
+BOOK_FILE = "book.bin"
+MAGIC = b"TTTB"
+VERSION = 1
+# magic, version, reserved, number of entries
+HEADER = struct.Struct("<4sHHI")
+# canonical state id, 9-bit mask of its best moves on the canonical board
+RECORD = struct.Struct("<HH")
+
+# positions with fewer stones than this are in the opening book
+OPENING_PLIES = 2
+# positions with at most this many empty cells are in the tablebase
+ENDGAME_EMPTIES = 4
+
+
+def _in_book(stones):
+    return stones < OPENING_PLIES or 9 - stones <= ENDGAME_EMPTIES
+
+
+def generate_book(filename=BOOK_FILE):
+    """
+    solve every reachable position and keep the canonical ones in the
+    opening or endgame range, with all their optimal moves
+    """
+    from solver import _bits_to_state, _reachable, get_solver, state_to_bits
+
+    solver = get_solver()
+    entries = {}
+    for x_bits, o_bits in _reachable(solver):
+        state = _bits_to_state(x_bits, o_bits)
+        if not _in_book(9 - state.count(0)):
+            continue
+        canon, _ = canonicalize(state)
+        index = state_index(canon)
+        if index not in entries:
+            best = solver.best_actions(*state_to_bits(canon))
+            entries[index] = sum(1 << action for action in best)
+
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(entries)))
+        for index in sorted(entries):
+            f.write(RECORD.pack(index, entries[index]))
+    print(f"Book written to {filename} ({len(entries)} positions).")
+    return entries
+
+
+class Book:
+    """
+    Opening book + endgame tablebase: the optimal moves of the first
+    OPENING_PLIES plies and of every position with at most ENDGAME_EMPTIES
+    empty cells, keyed by canonical state (symmetry.canonicalize), so one
+    entry covers all 8 rotations/reflections of a position.
+
+    The file is read on the first lookup. Lookups count opening / endgame
+    hits and misses; a miss is a position in the book's range with no
+    entry (unreachable), positions outside the range are not counted.
+    """
+
+    def __init__(self, filename=BOOK_FILE):
+        self.filename = filename
+        self.entries = None
+        self.opening_hits = 0
+        self.endgame_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        with open(self.filename, "rb") as f:
+            data = f.read()
+        magic, version, _, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.filename} is not a version {VERSION} book")
+        self.entries = dict(RECORD.iter_unpack(data[HEADER.size :]))
+        if len(self.entries) != count:
+            raise ValueError(f"{self.filename} is truncated")
+
+    def covers(self, state):
+        """
+        whether state is in the book's range, where lookup answers every
+        reachable position
+        """
+        return _in_book(9 - list(state).count(0))
+
+    def lookup(self, state, available_actions=None):
+        """
+        an optimal action for state, or None when it is not in the book
+        """
+        stones = 9 - list(state).count(0)
+        if not _in_book(stones):
+            return None
+        if self.entries is None:
+            self.load()
+        canon, action_map = canonicalize(state)
+        mask = self.entries.get(state_index(canon))
+        with self._lock:
+            if mask is None:
+                self.misses += 1
+            elif stones < OPENING_PLIES:
+                self.opening_hits += 1
+            else:
+                self.endgame_hits += 1
+        if mask is None:
+            return None
+        if available_actions is None:
+            available_actions = legal_actions(state)
+        # the moves whose image on the canonical board is a best move
+        return random.choice(
+            [a for a in available_actions if mask >> action_map[a] & 1]
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "opening_hits": self.opening_hits,
+                "endgame_hits": self.endgame_hits,
+                "misses": self.misses,
+            }
+
+
+_BOOK = None
+
+
+def get_book(filename=BOOK_FILE):
+    """
+    the shared Book; the file is generated once if it does not exist yet
+    """
+    global _BOOK
+    if _BOOK is None:
+        if not os.path.exists(filename):
+            generate_book(filename)
+        _BOOK = Book(filename)
+    return _BOOK
+
+
+if __name__ == "__main__":
+    from solver import _bits_to_state, _reachable, get_solver
+
+    generate_book()
+    book = Book()
+    solver = get_solver()
+    for x_bits, o_bits in _reachable(solver):
+        action = book.lookup(_bits_to_state(x_bits, o_bits))
+        assert action is None or action in solver.best_actions(x_bits, o_bits)
+    print(f"checked against the solver: {book.stats()}")
@@ -0,0 +1,177 @@
+import copy
+import os
+import struct
+import threading
+import zlib
+
+from board import state_index
+from model_format import _all_states
+
+MAGIC = b"TTTL"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")  # magic, version, reserved
+BATCH = struct.Struct("<II")  # entries in the batch, crc32 of its records
+RECORD = struct.Struct("<HBf")  # state id, action, Q-value
+
+
+def atomic_save(agent, filename):
+    """
+    save to a temp file next to filename, fsync it, then rename over it, so
+    a crash never leaves a half-written model behind
+    returns False for read-only backends (solver, policy) that write nothing
+    """
+    root, ext = os.path.splitext(filename)
+    tmp = f"{root}.tmp{ext}"
+    agent.save_model(tmp)
+    if not os.path.exists(tmp):
+        return False
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+    return True
+
+
+def _records(agent, keys):
+    q_table = agent.q_table
+    if isinstance(q_table, dict):
+        for key in keys:
+            state, action = key
+            yield RECORD.pack(state_index(state), action, q_table[key])
+    else:
+        for index, action in keys:
+            yield RECORD.pack(index, action, float(q_table[index, action]))
+
+
+def _apply(agent, data):
+    q_table = agent.q_table
+    if isinstance(q_table, dict):
+        states = _all_states()
+        for index, action, value in RECORD.iter_unpack(data):
+            q_table[(states[index], action)] = value
+    else:
+        visited = getattr(agent, "visited", None)
+        for index, action, value in RECORD.iter_unpack(data):
+            q_table[index, action] = value
+            if visited is not None:
+                visited[index] = True
+
+
+def replay(agent, log_file):
+    """
+    apply every complete batch of a log to agent.q_table; stops at the first
+    torn or corrupt batch and returns the offset where valid data ends
+    """
+    with open(log_file, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return 0
+        magic, version, _ = HEADER.unpack(header)
+        if magic != MAGIC or version > VERSION:
+            raise ValueError(f"{log_file} is not a checkpoint log")
+        good = f.tell()
+        while True:
+            batch = f.read(BATCH.size)
+            if len(batch) < BATCH.size:
+                return good
+            count, crc = BATCH.unpack(batch)
+            data = f.read(count * RECORD.size)
+            if len(data) < count * RECORD.size or zlib.crc32(data) != crc:
+                return good
+            _apply(agent, data)
+            good = f.tell()
+
+
+class CheckpointLog:
+    """
+    Snapshot plus append-only log of changed entries.
+
+    The snapshot is a regular model file (agent.save_model / load_model).
+    save() appends only the entries the agent changed since the previous
+    save, as one crc-checked batch that is fsynced before returning. Once
+    the log passes compact_bytes it is rotated to <log>.old and a new
+    snapshot is written in a background thread, after which the old log is
+    deleted. load() reads the snapshot and replays <log>.old and <log>;
+    entries hold absolute values, so replaying one twice is harmless, and a
+    torn batch from a crash is dropped.
+    """
+
+    def __init__(self, filename, compact_bytes=1 << 20):
+        self.filename = filename
+        self.log_file = filename + ".log"
+        self.old_log_file = self.log_file + ".old"
+        self.compact_bytes = compact_bytes
+        self._compactor = None
+        self._lock = threading.Lock()
+
+    def track(self, agent):
+        agent.dirty = set()
+
+    def load(self, agent):
+        agent.load_model(self.filename)
+        if agent.q_table is None:
+            return
+        for log_file in (self.old_log_file, self.log_file):
+            if os.path.exists(log_file):
+                good = replay(agent, log_file)
+                if log_file == self.log_file and good < os.path.getsize(log_file):
+                    # drop a torn tail so later appends start on a batch edge
+                    with open(log_file, "r+b") as f:
+                        f.truncate(good)
+        if os.path.exists(self.old_log_file):
+            # a compaction was interrupted; agent now holds snapshot + both
+            # logs, so finish it here before anything is appended again
+            atomic_save(agent, self.filename)
+            os.remove(self.old_log_file)
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
+
+    def save(self, agent):
+        """
+        append the agent's changed entries; O(changed entries)
+        """
+        keys, agent.dirty = agent.dirty, set()
+        if not keys:
+            return
+        data = b"".join(_records(agent, keys))
+        with self._lock:
+            new = not os.path.exists(self.log_file)
+            with open(self.log_file, "ab") as f:
+                if new or f.tell() == 0:
+                    f.write(HEADER.pack(MAGIC, VERSION, 0))
+                f.write(BATCH.pack(len(keys), zlib.crc32(data)) + data)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+        if size >= self.compact_bytes:
+            self.compact(agent)
+
+    def compact(self, agent, background=True):
+        """
+        fold the log into a new snapshot of agent; call with background=False
+        after writing every entry some other way (e.g. after training)
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            if background:
+                return
+            self._compactor.join()
+        with self._lock:
+            if os.path.exists(self.log_file):
+                os.replace(self.log_file, self.old_log_file)
+            snapshot = copy.copy(agent)
+            snapshot.q_table = copy.copy(agent.q_table)
+            snapshot.dirty = None
+
+        def write():
+            atomic_save(snapshot, self.filename)
+            if os.path.exists(self.old_log_file):
+                os.remove(self.old_log_file)
+
+        if background:
+            self._compactor = threading.Thread(target=write, daemon=True)
+            self._compactor.start()
+        else:
+            write()
+
+    def wait(self):
+        if self._compactor is not None:
+            self._compactor.join()
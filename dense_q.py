@@ -0,0 +1,252 @@
+import random
+import threading
+
+import numpy as np
+
+from board import NUM_STATES, state_index
+from train import QLearningAgent
+
+_POW3 = 3 ** np.arange(9)
+# DIGITS[index] -> per-cell base-3 digits (0 empty, 1 X, 2 O)
+DIGITS = (np.arange(NUM_STATES)[:, None] // _POW3) % 3
+LEGAL = DIGITS == 0
+# added to a Q row so that argmax/max only see empty cells
+LEGAL_MASK = np.where(LEGAL, 0.0, -np.inf).astype(np.float32)
+
+
+def random_argmax(rows, rng):
+    """
+    row-wise argmax with ties broken at random (numpy Generator rng), like
+    QLearningAgent.greedy_action
+    """
+    ties = rows == rows.max(axis=1, keepdims=True)
+    return np.where(ties, rng.random(rows.shape), -1).argmax(axis=1)
+
+
+class DenseQLearningAgent(QLearningAgent):
+    """
+    Same learning rule as QLearningAgent, but q_table is a float32 array of
+    shape (3**9, 9) indexed by board.state_index(state) instead of a dict.
+
+    Legal actions come from the state itself, so available_actions is only
+    used to tell whether the next state has any move left. Ties are broken
+    at random, as in QLearningAgent.
+
+    With symmetric=True only the row of each state's canonical board is
+    used (see symmetry.canonical_index_tables) and actions are mapped
+    into that board's frame.
+    """
+
+    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.1, symmetric=False):
+        super().__init__(alpha, gamma, epsilon)
+        self.q_table = np.zeros((NUM_STATES, 9), dtype=np.float32)
+        # rows written by an update or a .qtb / .pkl load, see has_state
+        self.visited = np.zeros(NUM_STATES, dtype=bool)
+        self.symmetric = symmetric
+        if symmetric:
+            from symmetry import canonical_index_tables
+
+            self._canon, self._action_map = canonical_index_tables()
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # sent to training workers: drop thread-local buffers and the
+        # symmetry tables, both are rebuilt on the other side
+        state = self.__dict__.copy()
+        for name in ("_local", "_canon", "_action_map"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.symmetric:
+            from symmetry import canonical_index_tables
+
+            self._canon, self._action_map = canonical_index_tables()
+        self._local = threading.local()
+
+    def _scratch(self):
+        # one reusable row buffer per thread (gunicorn threads share the agent)
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = np.empty(9, dtype=np.float32)
+        return buf
+
+    def _cell(self, index, action):
+        if self.symmetric:
+            return self._canon[index], self._action_map[index, action]
+        return index, action
+
+    def _masked_row(self, index):
+        # Q-values of every action in this state's own frame, illegal = -inf
+        buf = self._scratch()
+        if self.symmetric:
+            np.take(self.q_table[self._canon[index]], self._action_map[index], out=buf)
+            np.add(buf, LEGAL_MASK[index], out=buf)
+        else:
+            np.add(self.q_table[index], LEGAL_MASK[index], out=buf)
+        return buf
+
+    def masked_rows(self, indices):
+        """
+        batched _masked_row: (len(indices), 9) Q-values, illegal = -inf
+        """
+        if self.symmetric:
+            rows = np.take_along_axis(
+                self.q_table[self._canon[indices]], self._action_map[indices], axis=1
+            )
+        else:
+            rows = self.q_table[indices]
+        return rows + LEGAL_MASK[indices]
+
+    def get_q_value(self, state, action):
+        return float(self.q_table[self._cell(state_index(state), action)])
+
+    def has_state(self, state):
+        """
+        visited row, or any non-zero value (.npy files keep no visited mask)
+        """
+        index = state_index(state)
+        row = self._canon[index] if self.symmetric else index
+        return bool(self.visited[row] or self.q_table[row].any())
+
+    def set_q_value(self, state, action, value):
+        cell = self._cell(state_index(state), action)
+        self.q_table[cell] = value
+        self.visited[cell[0]] = True
+        if self.dirty is not None:
+            self.dirty.add((int(cell[0]), int(cell[1])))
+
+    def greedy_action(self, state, available_actions):
+        row = self._masked_row(state_index(state))
+        best = np.flatnonzero(row == row.max())
+        return int(best[0]) if len(best) == 1 else int(random.choice(best))
+
+    def track_visits(self, omega=0.6):
+        self.visits = np.zeros(self.q_table.shape, dtype=np.uint32)
+        self.visit_omega = omega
+
+    def _visit_alpha(self, cell):
+        self.visits[cell] += 1
+        return max(self.alpha, float(self.visits[cell]) ** -self.visit_omega)
+
+    def max_q_value(self, index):
+        return float(self._masked_row(index).max())
+
+    def update_q_table(self, state, action, reward, next_state, available_actions):
+        cell = self._cell(state_index(state), action)
+        old_q = self.q_table[cell]
+        next_max_q = (
+            self.max_q_value(state_index(next_state)) if available_actions else 0.0
+        )
+        alpha = self.alpha if self.visits is None else self._visit_alpha(cell)
+        new_q = old_q + alpha * (reward + self.gamma * next_max_q - old_q)
+        self.q_table[cell] = new_q
+        self.visited[cell[0]] = True
+        if self.dirty is not None:
+            self.dirty.add((int(cell[0]), int(cell[1])))
+        return float(new_q - old_q)
+
+    def update_batch(
+        self, indices, actions, rewards, next_indices, has_next, weights=None
+    ):
+        """
+        update_q_table for arrays of transitions at once (see
+        replay.ReplayBuffer); weights scale each step, and with
+        track_visits() every cell steps by max(alpha, n ** -omega) as in
+        update_q_table. If a cell appears twice only the last write is kept
+        (its visits are counted twice).
+        returns (TD errors, summed absolute change)
+        """
+        cell = self._cell(indices, actions)
+        old_q = self.q_table[cell]
+        next_max_q = np.where(has_next, self.masked_rows(next_indices).max(axis=1), 0)
+        td = rewards + self.gamma * next_max_q - old_q
+        if self.visits is None:
+            alpha = self.alpha
+        else:
+            np.add.at(self.visits, cell, 1)
+            alpha = np.maximum(
+                self.alpha, self.visits[cell].astype(np.float32) ** -self.visit_omega
+            )
+        step = alpha * td if weights is None else alpha * weights * td
+        self.q_table[cell] = old_q + step
+        self.visited[cell[0]] = True
+        if self.dirty is not None:
+            self.dirty.update(zip(cell[0].tolist(), cell[1].tolist()))
+        return td, float(np.abs(step).sum())
+
+    def save_model(self, filename="q_table.npy"):
+        if filename.endswith(".qtb"):
+            from model_format import write_q_table
+
+            write_q_table(filename, array_to_dict(self.q_table))
+            return
+        with open(filename, "wb") as f:
+            np.save(f, self.q_table)
+
+    def load_model(self, filename="q_table.npy"):
+        try:
+            from model_format import is_q_table_file, iter_q_table
+
+            if is_q_table_file(filename):
+                array = np.zeros((NUM_STATES, 9), dtype=np.float32)
+                self.visited[:] = False
+                for index, action, value in iter_q_table(filename):
+                    array[index, action] = value
+                    self.visited[index] = True
+                self.q_table = array
+            elif filename.endswith(".pkl"):
+                import pickle
+
+                with open(filename, "rb") as f:
+                    q_table = pickle.load(f)
+                self.q_table = dict_to_array(q_table)
+                self.visited[:] = False
+                self.visited[[state_index(state) for state, _ in q_table]] = True
+            else:
+                with open(filename, "rb") as f:
+                    self.q_table = np.load(f).astype(np.float32, copy=False)
+            print("Model loaded successfully.")
+        except FileNotFoundError:
+            print("No existing model found. Starting with a new model.")
+
+
+def dict_to_array(q_table):
+    array = np.zeros((NUM_STATES, 9), dtype=np.float32)
+    for (state, action), value in q_table.items():
+        array[state_index(state), action] = value
+    return array
+
+
+def array_to_dict(array):
+    """
+    non-zero entries keyed like QLearningAgent.q_table
+    """
+    from board import index_to_state
+
+    return {
+        (tuple(index_to_state(int(index))), int(action)): float(array[index, action])
+        for index, action in zip(*np.nonzero(array))
+    }
+
+
+def convert_pickle(src="q_table.pkl", dst="q_table.npy"):
+    """
+    convert a dict pickle written by QLearningAgent.save_model
+    """
+    import pickle
+
+    with open(src, "rb") as f:
+        q_table = pickle.load(f)
+    array = dict_to_array(q_table)
+    with open(dst, "wb") as f:
+        np.save(f, array)
+    print(f"{len(q_table)} entries: {src} -> {dst}")
+    return array
+
+
+if __name__ == "__main__":
+    import sys
+
+    convert_pickle(*sys.argv[1:3])
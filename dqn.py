@@ -0,0 +1,313 @@
+import time
+
+import numpy as np
+
+from board import Board
+
+MODEL_FILE = "dqn.npz"
+
+
+def features(states):
+    """
+    (B, cells) boards -> (B, 2 * cells) inputs from the mover's side: one
+    plane for the mover's stones, one for the opponent's (X moves when the
+    counts are equal, i.e. the cells sum to 0)
+    """
+    states = np.asarray(states, dtype=np.int8)
+    relative = states * np.where(states.sum(axis=1) == 0, 1, -1)[:, None]
+    return np.concatenate((relative == 1, relative == -1), axis=1).astype(np.float32)
+
+
+class DQNAgent:
+    """
+    Q-function approximated by a small MLP (ReLU hidden layers) in NumPy,
+    with the choose_action / update_q_table / save_model / load_model
+    surface of QLearningAgent. Works on any board of num_cells cells since
+    nothing is indexed by state id; Q-values are from the mover's side.
+
+    update_q_table stores the transition in a ring buffer and, every
+    train_every transitions, takes one Adam step (learning rate alpha) on
+    a minibatch of batch_size: the newest transition plus random older
+    ones. Targets use a target network copied from the online one every
+    target_sync steps: reward + gamma * max Q_target(next_state), or just
+    the reward when no move is left. TD errors are clipped to [-1, 1]
+    (Huber loss). update_batch does the same for replay.ReplayBuffer.
+
+    There is no table, so q_table is None: checkpoint logs and online
+    learning treat it like the frozen backends.
+    """
+
+    def __init__(
+        self,
+        alpha=1e-3,
+        gamma=0.9,
+        epsilon=0.1,
+        num_cells=9,
+        hidden=(64, 64),
+        batch_size=32,
+        capacity=50000,
+        train_every=1,
+        target_sync=500,
+        seed=None,
+    ):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.num_cells = num_cells
+        self.hidden = tuple(hidden)
+        self.batch_size = batch_size
+        self.train_every = train_every
+        self.target_sync = target_sync
+        self.q_table = None
+        self.dirty = None
+        self.visits = None
+        self.book = None
+        self.rng = np.random.default_rng(seed)
+
+        sizes = (2 * num_cells,) + self.hidden + (num_cells,)
+        arrays = []
+        for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+            scale = np.sqrt(2.0 / fan_in)
+            arrays.append(self.rng.standard_normal((fan_in, fan_out)) * scale)
+            arrays.append(np.zeros(fan_out))
+        self._set_params(arrays)
+
+        self.capacity = capacity
+        self._states = np.zeros((capacity, num_cells), dtype=np.int8)
+        self._actions = np.zeros(capacity, dtype=np.int16)
+        self._rewards = np.zeros(capacity, dtype=np.float32)
+        self._next_states = np.zeros((capacity, num_cells), dtype=np.int8)
+        self._has_next = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self._next = 0
+        self._pending = 0
+
+    # network
+
+    def _set_params(self, arrays):
+        """
+        every weight / bias is a view into one flat float32 vector (and so
+        are their gradients), so Adam and the target sync are a handful of
+        vector ops instead of a few per layer
+        """
+        total = sum(a.size for a in arrays)
+        self._flat = np.zeros(total, dtype=np.float32)
+        self._grad_flat = np.zeros(total, dtype=np.float32)
+        self._m = np.zeros(total, dtype=np.float32)
+        self._v = np.zeros(total, dtype=np.float32)
+        self._target_flat = np.zeros(total, dtype=np.float32)
+        self.params, self.grads, self.target = [], [], []
+        offset = 0
+        for a in arrays:
+            end = offset + a.size
+            self.params.append(self._flat[offset:end].reshape(a.shape))
+            self.grads.append(self._grad_flat[offset:end].reshape(a.shape))
+            self.target.append(self._target_flat[offset:end].reshape(a.shape))
+            self.params[-1][...] = a
+            offset = end
+        self._target_flat[:] = self._flat
+        self.hidden = tuple(a.shape[1] for a in arrays[0:-2:2])
+        self.steps = 0
+
+    def _forward(self, x, params):
+        """
+        Q-values plus the activations backprop needs
+        """
+        activations = [x]
+        for i in range(0, len(params) - 2, 2):
+            x = np.maximum(x @ params[i] + params[i + 1], 0)
+            activations.append(x)
+        return x @ params[-2] + params[-1], activations
+
+    def q_values(self, states, target=False):
+        """
+        (B, cells) Q-values of a batch of boards, occupied cells = -inf
+        """
+        states = np.asarray(states, dtype=np.int8).reshape(-1, self.num_cells)
+        q, _ = self._forward(features(states), self.target if target else self.params)
+        return np.where(states == Board.EMPTY_CELL, q, -np.inf)
+
+    def masked_rows(self, indices):
+        """
+        q_values of 3x3 boards given by state id (scheduler, asgi_app)
+        """
+        from dense_q import DIGITS
+
+        digits = DIGITS[indices]
+        return self.q_values(np.where(digits == 2, Board.PLAYER_O, digits))
+
+    def get_q_value(self, state, action):
+        return float(self.q_values([state])[0, action])
+
+    def greedy_action(self, state, available_actions):
+        return int(self.q_values([state])[0].argmax())
+
+    def choose_action(self, state, available_actions):
+        if self.book is not None:
+            action = self.book.lookup(state, available_actions)
+            if action is not None:
+                return action
+        if self.rng.random() < self.epsilon:
+            return int(self.rng.choice(available_actions))
+        return self.greedy_action(state, available_actions)
+
+    # learning
+
+    def _step(self, states, actions, rewards, next_states, has_next, weights=None):
+        """
+        one Adam step on a minibatch; returns the TD errors before it
+        """
+        next_max_q = np.zeros(len(states), dtype=np.float32)
+        if has_next.any():
+            next_q = self.q_values(next_states[has_next], target=True)
+            next_max_q[has_next] = next_q.max(axis=1)
+        targets = rewards + self.gamma * next_max_q
+
+        q, activations = self._forward(features(states), self.params)
+        rows = np.arange(len(states))
+        td = targets - q[rows, actions]
+        grad = np.zeros_like(q)
+        # d(Huber loss)/dq, averaged over the batch
+        grad[rows, actions] = -np.clip(td, -1.0, 1.0) / len(states)
+        if weights is not None:
+            grad[rows, actions] *= weights
+
+        for layer in range(len(self.params) // 2 - 1, -1, -1):
+            weight = 2 * layer
+            np.matmul(activations[layer].T, grad, out=self.grads[weight])
+            grad.sum(axis=0, out=self.grads[weight + 1])
+            if layer:
+                grad = (grad @ self.params[weight].T) * (activations[layer] > 0)
+
+        self.steps += 1
+        beta1, beta2 = 0.9, 0.999
+        lr = self.alpha * np.sqrt(1 - beta2**self.steps) / (1 - beta1**self.steps)
+        g, m, v = self._grad_flat, self._m, self._v
+        m *= beta1
+        m += (1 - beta1) * g
+        v *= beta2
+        v += (1 - beta2) * g * g
+        self._flat -= lr * m / (np.sqrt(v) + 1e-8)
+
+        if self.steps % self.target_sync == 0:
+            self._target_flat[:] = self._flat
+        return td
+
+    def update_q_table(self, state, action, reward, next_state, available_actions):
+        """
+        store the transition and train on a minibatch every train_every
+        calls; returns the newest transition's TD error when a step was
+        taken, else 0.0
+        """
+        i = self._next
+        self._states[i] = state
+        self._actions[i] = action
+        self._rewards[i] = reward
+        self._next_states[i] = next_state
+        self._has_next[i] = bool(available_actions)
+        self._next = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self._pending += 1
+        if self._pending < self.train_every:
+            return 0.0
+        self._pending = 0
+
+        batch = self.rng.integers(0, self.size, min(self.batch_size, self.size))
+        batch[0] = i
+        td = self._step(
+            self._states[batch],
+            self._actions[batch],
+            self._rewards[batch],
+            self._next_states[batch],
+            self._has_next[batch],
+        )
+        return float(td[0])
+
+    def update_batch(
+        self, indices, actions, rewards, next_indices, has_next, weights=None
+    ):
+        """
+        replay.ReplayBuffer minibatch of 3x3 state ids
+        returns (TD errors, summed absolute TD error)
+        """
+        from board import index_to_state
+
+        states = np.array([index_to_state(int(i)) for i in indices], dtype=np.int8)
+        next_states = np.array(
+            [index_to_state(int(i)) for i in next_indices], dtype=np.int8
+        )
+        td = self._step(
+            states,
+            np.asarray(actions, dtype=np.int64),
+            np.asarray(rewards, dtype=np.float32),
+            next_states,
+            np.asarray(has_next, dtype=bool),
+            weights,
+        )
+        return td, float(np.abs(td).sum())
+
+    # weights file: the float32 arrays of the online network, in layer order
+
+    def save_model(self, filename=MODEL_FILE):
+        with open(filename, "wb") as f:
+            np.savez(f, *self.params)
+
+    def load_model(self, filename=MODEL_FILE):
+        try:
+            with np.load(filename) as data:
+                params = [data[f"arr_{i}"] for i in range(len(data.files))]
+            if params[0].shape[0] != 2 * self.num_cells:
+                raise ValueError(f"{filename} is for another board size")
+            self._set_params(params)
+            print("Model loaded successfully.")
+        except FileNotFoundError:
+            print("No existing model found. Starting with a new model.")
+
+
+def benchmark(num_games=20000, seed=0):
+    """
+    self-play training speed, per-move latency and strength of the MLP
+    against the tabular agent on 3x3
+    """
+    import random
+
+    from player import Player
+    from scheduler import reachable_states
+    from train import QLearningAgent, evaluate, train_with_self_play
+    from transitions import legal_actions
+
+    random.seed(seed)
+    states = reachable_states()
+    moves = [legal_actions(state) for state in states]
+    opponents = {
+        "random": Player(is_human=False),
+        "perfect": Player(is_human=False, use_solver=True),
+    }
+    for name, agent in (
+        ("table", QLearningAgent()),
+        ("dqn", DQNAgent(seed=seed)),
+    ):
+        start = time.perf_counter()
+        train_with_self_play(agent, num_games, save=False)
+        train_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for state, actions in zip(states, moves):
+            agent.greedy_action(state, actions)
+        latency = (time.perf_counter() - start) / len(states)
+
+        results = []
+        for opponent in opponents.values():
+            for marker in ("X", "O"):
+                win, draw, loss = evaluate(agent, opponent, 200, agent_marker=marker)
+                results.append(f"{win:.0%}/{draw:.0%}/{loss:.0%}")
+        print(
+            f"{name:>5}: {num_games / train_time:,.0f} games/sec, "
+            f"{latency * 1e6:.1f} us/move, "
+            f"win/draw/loss vs random X {results[0]} O {results[1]}, "
+            f"vs perfect X {results[2]} O {results[3]}"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,30 +1,63 @@
 import os
 
+from agents import MODEL_FILES, make_agent
 from board import Board
+from book import get_book
+from checkpoint_log import CheckpointLog
+from online_learning import OnlineLearner
 from player import Player
-from train import QLearningAgent, train_with_self_play
+
+# opening book / endgame tablebase ahead of the Q-table
+USE_BOOK = os.environ.get("TICTACTOE_BOOK", "1") == "1"
 
 
 class TicTacToeGame:
-    def __init__(self):
-        self.agent = QLearningAgent()
-        self.q_table_file = "q_table.pkl"
+    def __init__(
+        self,
+        backend="dict",
+        num_workers=1,
+        sync_interval=1000,
+        merge="average",
+        metrics_file=None,
+        schedule=False,
+        replay=False,
+    ):
+        self.agent = make_agent(backend)
+        if USE_BOOK:
+            # the computer's moves come from the opening book / tablebase first
+            self.agent.book = get_book()
+        self.q_table_file = MODEL_FILES[backend]
+        # snapshot in q_table_file plus a log of entries changed since
+        self.log = CheckpointLog(self.q_table_file)
+        # num_workers > 1 trains with parallel.train_parallel
+        self.num_workers = num_workers
+        self.sync_interval = sync_interval
+        self.merge = merge
+        # serial training writes metrics.TrainingMetrics rows here
+        self.metrics_file = metrics_file
+        # serial training uses scheduler.recommended()
+        self.schedule = schedule
+        # one replay.ReplayBuffer for serial training and live games
+        self.replay = None
+        if replay:
+            from replay import ReplayBuffer
+
+            self.replay = ReplayBuffer()
+        # the model is loaded on first use (load_model), not at start-up
+        self.loaded = False
+        self.learner = None
 
     def start(self):
         print("*" * 20)
         print("     Welcome to Tic-Tac-Toe     ")
         print("*" * 20)
 
-        # Load or create Q-table
-        if os.path.exists(self.q_table_file):
-            self.agent.load_model(self.q_table_file)
-        else:
-            print("No existing model found. Starting with a new model.")
-
         while True:
             choice = input(
                 "Do you want to (1) Play a game or (2) Train the AI? Enter 1 or 2: "
             ).strip()
+            # the model is only read once there is something to do with it
+            self.load_model()
             if choice == "1":
                 self.start_new_game()
             elif choice == "2":
@@ -37,16 +70,35 @@ class TicTacToeGame:
                 input("Would you like to continue? [yes|y]/[no|n]: ").strip().lower()
             )
             if play_again in ["no", "n"]:
+                if self.learner is not None:
+                    self.learner.stop()
                 print("Bye! Come back soon")
                 break
             elif play_again not in ["yes", "y"]:
                 print("Invalid input, but I'll assume you want to continue!")
 
+    def load_model(self):
+        """
+        load or create the model and start online learning; only once
+        """
+        if self.loaded:
+            return
+        self.loaded = True
+        if os.path.exists(self.q_table_file):
+            self.log.load(self.agent)
+        else:
+            print("No existing model found. Starting with a new model.")
+        # the learner copies the table; backends without one update in place
+        if self.agent.q_table is not None:
+            self.learner = OnlineLearner(
+                self.agent, self.q_table_file, log=self.log, replay=self.replay
+            )
+
     def start_new_game(self):
         board = Board()
         human_player = Player(is_human=True)
         computer_player = Player(
-            is_human=False, use_rl=True, q_table=self.agent.q_table
+            is_human=False, use_rl=True, q_table=self.agent.q_table, agent=self.agent
         )
         current_player = human_player
 
@@ -71,20 +123,16 @@ class TicTacToeGame:
                     print(f"Awesome, {winner} win!")
                     final_reward = reward if not current_player.is_human else -reward
 
-                # Update Q-table
-                for state, action in reversed(game_history):
-                    available_actions = [
-                        i
-                        for i in range(9)
-                        if board.game_board[i // 3][i % 3] == Board.EMPTY_CELL
-                    ]
-                    self.agent.update_q_table(
-                        state, action, final_reward, next_state, available_actions
-                    )
-                    final_reward *= (
-                        self.agent.gamma
-                    )  # Discount the reward for earlier actions
+                if self.learner is not None:
+                    # Update Q-table in the background, checkpointed on a timer
+                    self.learner.submit(game_history, final_reward, next_state)
+                else:
+                    from train import update_from_live_game
 
+                    update_from_live_game(
+                        self.agent, game_history, final_reward, next_state
+                    )
+                    self.agent.save_model(self.q_table_file)
                 break
 
             state = next_state
@@ -92,11 +140,49 @@ class TicTacToeGame:
                 human_player if current_player == computer_player else computer_player
             )
 
-        # Save the updated Q-table after each game
-        self.agent.save_model(self.q_table_file)
-
     def train_ai(self):
         num_games = int(input("How many training games do you want to play? "))
-        train_with_self_play(self.agent, num_games)
+        learner = self.learner
+        if learner is not None:
+            # finish pending live updates so training starts from them
+            learner.stop()
+        if self.num_workers > 1:
+            from parallel import train_parallel
+
+            train_parallel(
+                self.agent,
+                num_games,
+                self.num_workers,
+                self.sync_interval,
+                self.merge,
+                save=False,
+            )
+        else:
+            from train import train_with_self_play
+
+            metrics = None
+            if self.metrics_file:
+                from metrics import TrainingMetrics
+
+                metrics = TrainingMetrics(self.agent, filename=self.metrics_file)
+            scheduler = None
+            if self.schedule:
+                from scheduler import recommended
+
+                scheduler = recommended()
+            train_with_self_play(
+                self.agent,
+                num_games,
+                metrics=metrics,
+                scheduler=scheduler,
+                replay=self.replay,
+            )
+            if metrics is not None and metrics.converged:
+                print("Converged: no losses against random or perfect play.")
         # train_with_human_play(self.agent, num_games)
-        self.agent.save_model(self.q_table_file)
+        # every entry may have changed, write a full snapshot and drop the log
+        self.log.compact(self.agent, background=False)
+        if learner is not None:
+            self.learner = OnlineLearner(
+                self.agent, self.q_table_file, log=self.log, replay=self.replay
+            )
@@ -0,0 +1,178 @@
+import random
+
+from board import Board
+from move import Move
+
+# (row, column) steps of the four line directions
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+MAX_SIZE = 19
+
+
+def parse_board_size(text):
+    """
+    "ROWSxCOLUMNS" or "ROWSxCOLUMNS:K", e.g. "15x15:5" -> (15, 15, 5);
+    k defaults to min(rows, columns, 5)
+    """
+    size, _, k = text.lower().partition(":")
+    rows, _, columns = size.partition("x")
+    rows = int(rows)
+    columns = int(columns or rows)
+    k = int(k) if k else min(rows, columns, 5)
+    check_board_size(rows, columns, k)
+    return rows, columns, k
+
+
+def check_board_size(rows, columns, k):
+    if not (3 <= rows <= MAX_SIZE and 3 <= columns <= MAX_SIZE):
+        raise ValueError(f"board must be between 3x3 and {MAX_SIZE}x{MAX_SIZE}")
+    if not 3 <= k <= max(rows, columns):
+        raise ValueError("k must be between 3 and the longest side")
+
+
+class GridBoard(Board):
+    """
+    rows x columns board where k in a row (horizontal, vertical or
+    diagonal) wins. Positions are 1..rows*columns, row-major like Board.
+
+    Win detection is incremental: step() only scans the four lines through
+    the cell just played, at most k - 1 cells each way, so its cost does
+    not depend on the board area. check_winner / check_is_tie then just
+    read the recorded result. Empty cells are kept in a set for move
+    generation and a flat copy of the grid for board_to_state.
+    """
+
+    def __init__(self, rows=3, columns=3, k=3):
+        check_board_size(rows, columns, k)
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.num_cells = rows * columns
+        super().__init__()
+
+    def reset_board(self):
+        self.game_board = [[self.EMPTY_CELL] * self.columns for _ in range(self.rows)]
+        # flat copy of game_board, board_to_state is a single list copy
+        self.cells = [self.EMPTY_CELL] * self.num_cells
+        self.empty = set(range(self.num_cells))
+        self.winner = None
+        self.last_move = None
+        self.stones = []  # occupied cell indices in play order
+
+    def print_board_with_positions(self):
+        width = len(str(self.num_cells))
+        for row in range(self.rows):
+            cells = (
+                str(row * self.columns + col + 1).rjust(width)
+                for col in range(self.columns)
+            )
+            print("| " + " | ".join(cells) + " |")
+
+    def _cell(self, move):
+        if isinstance(move, int):
+            return (move - 1) // self.columns, (move - 1) % self.columns
+        return move.get_row(), move.get_column()
+
+    def line_length(self, row, col, value):
+        """
+        longest run of value through (row, col), counting (row, col) itself
+        whatever it holds; capped at k
+        """
+        board = self.game_board
+        best = 1
+        for dr, dc in DIRECTIONS:
+            length = 1
+            for sign in (1, -1):
+                r, c = row + sign * dr, col + sign * dc
+                while (
+                    length < self.k
+                    and 0 <= r < self.rows
+                    and 0 <= c < self.columns
+                    and board[r][c] == value
+                ):
+                    length += 1
+                    r += sign * dr
+                    c += sign * dc
+            if length >= self.k:
+                return self.k
+            best = max(best, length)
+        return best
+
+    def step(self, move, player_marker):
+        row, col = self._cell(move)
+        if not (0 <= row < self.rows and 0 <= col < self.columns):
+            return self.board_to_state(), -10, False, {}
+        if self.game_board[row][col] != self.EMPTY_CELL:
+            return self.board_to_state(), -10, False, {}
+
+        value = self.PLAYER_X if player_marker == "X" else self.PLAYER_O
+        index = row * self.columns + col
+        self.game_board[row][col] = value
+        self.cells[index] = value
+        self.empty.discard(index)
+        self.stones.append(index)
+        self.last_move = (row, col)
+        next_state = self.board_to_state()
+
+        if self.line_length(row, col, value) >= self.k:
+            self.winner = value
+            return next_state, 1, True, {}
+        elif not self.empty:
+            return next_state, 0, True, {}
+        else:
+            return next_state, 0, False, {}
+
+    def check_winner(self, player_marker):
+        value = self.PLAYER_X if player_marker == "X" else self.PLAYER_O
+        return self.winner == value
+
+    def check_is_tie(self):
+        return not self.empty
+
+    def board_to_state(self):
+        return list(self.cells)
+
+    def set_state(self, state):
+        # replayed in cell order, which finds a completed line all the same
+        self.reset_board()
+        for index, cell in enumerate(state):
+            if cell != self.EMPTY_CELL:
+                self.step(index + 1, "X" if cell == self.PLAYER_X else "O")
+
+    def available_actions(self):
+        return sorted(self.empty)
+
+
+def tactical_move(board, marker):
+    """
+    quick AI for boards too large for a Q-table: take a winning cell, else
+    block the opponent's, else the cell that extends the longest own or
+    opposing line; only cells next to a stone (or the centre) are tried
+    """
+    own = Board.PLAYER_X if marker == "X" else Board.PLAYER_O
+    columns = board.columns
+    if len(board.empty) == board.num_cells:
+        return Move((board.rows // 2) * columns + columns // 2 + 1, board.rows, columns)
+
+    candidates = set()
+    for index in board.stones:
+        row, col = divmod(index, columns)
+        for r in range(max(row - 1, 0), min(row + 2, board.rows)):
+            for c in range(max(col - 1, 0), min(col + 2, columns)):
+                if board.game_board[r][c] == Board.EMPTY_CELL:
+                    candidates.add(r * columns + c)
+
+    best_score, best = -1, []
+    for index in candidates:
+        row, col = divmod(index, columns)
+        attack = board.line_length(row, col, own)
+        defend = board.line_length(row, col, -own)
+        if attack >= board.k:
+            return Move(index + 1, board.rows, columns)
+        # a block of a winning line ranks above anything but a win
+        score = 2 * board.k + 1 if defend >= board.k else max(attack, defend)
+        score = score * 2 + (attack >= defend)
+        if score > best_score:
+            best_score, best = score, [index]
+        elif score == best_score:
+            best.append(index)
+    return Move(random.choice(best) + 1, board.rows, columns)
@@ -1,5 +1,50 @@
+import argparse
+
 from game import TicTacToeGame
 
 if __name__ == "__main__":
-    game = TicTacToeGame()
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe")
+    parser.add_argument("--backend", default="dict", help="Q-table backend")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="self-play training processes"
+    )
+    parser.add_argument(
+        "--sync-interval",
+        type=int,
+        default=1000,
+        help="games each worker plays between Q-table merges",
+    )
+    parser.add_argument("--merge", choices=("average", "delta"), default="average")
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="append training metrics to this .csv or .jsonl file",
+    )
+    parser.add_argument(
+        "--schedule",
+        action="store_true",
+        help="decay epsilon/alpha and stop once the policy is stable",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="learn from minibatches of an experience replay buffer",
+    )
+    args = parser.parse_args()
+    if args.workers > 1 and args.metrics:
+        parser.error("--metrics is only supported with --workers 1")
+    if args.workers > 1 and args.schedule:
+        parser.error("--schedule is only supported with --workers 1")
+    if args.workers > 1 and args.replay:
+        parser.error("--replay is only supported with --workers 1")
+
+    game = TicTacToeGame(
+        args.backend,
+        args.workers,
+        args.sync_interval,
+        args.merge,
+        args.metrics,
+        args.schedule,
+        args.replay,
+    )
     game.start()
@@ -1,21 +1,27 @@
+import copy
 import os
 import sys
+import threading
 
-from board import Board
-from game import TicTacToeGame
+from agents import make_agent, serving_model_file
+from bitboard import make_board
+from book import BOOK_FILE, get_book
+from checkpoint_log import CheckpointLog
+from grid_board import parse_board_size, tactical_move
 from player import Player
-from PyQt6.QtCore import Qt
+from transitions import legal_actions
+from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
 from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import (
     QApplication,
     QHBoxLayout,
     QLabel,
     QMessageBox,
+    QProgressBar,
     QPushButton,
     QVBoxLayout,
     QWidget,
 )
-from train import QLearningAgent
 
 
 def resource_path(relative_path):
@@ -26,16 +32,97 @@ def resource_path(relative_path):
         return os.path.join(os.path.abspath("."), relative_path)
 
 
+USE_BITBOARD = os.environ.get("TICTACTOE_BITBOARD", "0") == "1"
+# learn from finished games in a background thread
+ONLINE_LEARNING = os.environ.get("TICTACTOE_ONLINE_LEARNING", "0") == "1"
+USE_BOOK = os.environ.get("TICTACTOE_BOOK", "1") == "1"
+# work out the replies to every human move while the human is thinking
+PONDER = os.environ.get("TICTACTOE_PONDER", "1") == "1"
+
+
+class MoveSignals(QObject):
+    # generation the task was started in, chosen cell (0-based)
+    move = pyqtSignal(int, int)
+    # generation, {state tuple after a human move: reply cell}
+    pondered = pyqtSignal(int, object)
+
+
+class MoveTask(QRunnable):
+    """
+    runs compute(cancelled) on a QThreadPool thread and emits its result
+    with the generation it was started in; the signal is queued to the UI
+    thread, which drops results of a game that was reset meanwhile.
+    Setting `cancelled` before the result is ready discards it, long
+    computations may also poll it to stop early.
+    """
+
+    def __init__(self, compute, generation, cancelled, signal):
+        super().__init__()
+        self.compute = compute
+        self.generation = generation
+        self.cancelled = cancelled
+        self.signal = signal
+
+    def run(self):
+        if self.cancelled.is_set():
+            return
+        result = self.compute(self.cancelled)
+        if result is not None and not self.cancelled.is_set():
+            self.signal.emit(self.generation, result)
+
+
 class TicTacToeGUI(QWidget):
-    def __init__(self):
+    def __init__(self, use_bitboard=USE_BITBOARD, rows=3, columns=3, k=3):
         super().__init__()
-        self.board = Board()
-        self.agent = QLearningAgent()
-        self.agent.load_model(resource_path("q_table.pkl"))  # Load the trained model
+        self.board = make_board(use_bitboard, rows, columns, k)
+        self.rows, self.columns = rows, columns
+        # the Q-table only knows 3x3, larger boards use tactical_move
+        self.use_agent = (rows, columns, k) == (3, 3, 3)
+        self.agent = make_agent()
         self.human_player = Player(is_human=True)
-        self.ai_player = Player(is_human=False, use_rl=True, q_table=self.agent.q_table)
+        self.ai_player = Player(is_human=False, use_rl=True, agent=self.agent)
         self.current_player = self.human_player
+        self.history = []  # AI (state, action) pairs for online learning
+        self.learner = None
+        # the window shows while the model loads; ai_move waits for it
+        self.loader = threading.Thread(target=self.load_model, daemon=True)
+        self.loader.start()
+        # AI moves and pondering run on this pool, off the UI thread
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(2)
+        self.signals = MoveSignals()
+        self.signals.move.connect(self.on_ai_move)
+        self.signals.pondered.connect(self.on_pondered)
+        # bumped on reset, results of older tasks are dropped
+        self.generation = 0
+        self.move_cancelled = threading.Event()
+        self.ponder_cancelled = threading.Event()
+        self.ponder_cache = {}
+        self.thinking = False
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
         self.initUI()
+        self.ponder()
+
+    def load_model(self):
+        # Load the trained model, plus entries online learning logged since
+        self.checkpoint_log = CheckpointLog(resource_path(serving_model_file()))
+        self.checkpoint_log.load(self.agent)
+        self.ai_player.q_table = self.agent.q_table
+        if USE_BOOK:
+            self.agent.book = self.ai_player.book = get_book(resource_path(BOOK_FILE))
+        if ONLINE_LEARNING and self.agent.q_table is not None:
+            from online_learning import OnlineLearner
+
+            self.learner = OnlineLearner(
+                self.agent, self.checkpoint_log.filename, log=self.checkpoint_log
+            )
+
+    def shutdown(self):
+        self.cancel_tasks()
+        self.pool.waitForDone()
+        self.loader.join()
+        if self.learner is not None:
+            self.learner.stop()
 
     def initUI(self):
         self.setWindowTitle("Design Tic-Tac-Toe-Game By Leo")
@@ -48,13 +135,22 @@ class TicTacToeGUI(QWidget):
         self.status_label.setStyleSheet("background-color: black;color: white;")
         layout.addWidget(self.status_label)
 
+        # busy bar while the AI is thinking
+        self.thinking_bar = QProgressBar()
+        self.thinking_bar.setRange(0, 0)
+        self.thinking_bar.setTextVisible(False)
+        self.thinking_bar.setFixedHeight(8)
+        self.thinking_bar.hide()
+        layout.addWidget(self.thinking_bar)
+
         self.buttons = []
-        for i in range(3):
+        cell_size = max(24, 240 // max(self.rows, self.columns))
+        for i in range(self.rows):
             row_layout = QHBoxLayout()
-            for j in range(3):
+            for j in range(self.columns):
                 button = QPushButton("")
-                button.setFixedSize(80, 80)
-                button.setFont(QFont("Arial", 40, QFont.Weight.Bold))
+                button.setFixedSize(cell_size, cell_size)
+                button.setFont(QFont("Arial", cell_size // 2, QFont.Weight.Bold))
                 button.setStyleSheet("background-color: black; color: white;")
                 button.clicked.connect(
                     lambda _, row=i, col=j: self.on_button_click(row, col)
@@ -82,9 +178,10 @@ class TicTacToeGUI(QWidget):
     def on_button_click(self, row, col):
         if (
             self.current_player.is_human
+            and not self.thinking
             and self.board.game_board[row][col] == self.board.EMPTY_CELL
         ):
-            move = row * 3 + col + 1
+            move = row * self.columns + col + 1
             self.make_move(move)
             if not self.check_game_end():
                 self.ai_move()
@@ -110,11 +207,99 @@ class TicTacToeGUI(QWidget):
             button.setStyleSheet("background-color: black;color: red;")
 
     def ai_move(self):
-        state = self.board.board_to_state()
-        available_actions = [i for i in range(9) if state[i] == self.board.EMPTY_CELL]
-        action = self.agent.choose_action(state, available_actions)
+        """
+        play a pondered reply at once, else compute the move on the pool;
+        on_ai_move plays it when it arrives
+        """
+        self.ponder_cancelled.set()
+        state = tuple(self.board.board_to_state())
+        action = self.ponder_cache.get(state)
+        if action is not None:
+            self.on_ai_move(self.generation, action)
+            return
+        self.set_thinking(True)
+        self.move_cancelled = threading.Event()
+        board = copy.deepcopy(self.board)
+        self.pool.start(
+            MoveTask(
+                lambda cancelled: self.compute_move(board),
+                self.generation,
+                self.move_cancelled,
+                self.signals.move,
+            )
+        )
+
+    def compute_move(self, board):
+        """
+        the AI's cell (0-based) on a copy of the board; worker thread
+        """
+        if not self.use_agent:
+            return tactical_move(board, "O").value - 1
+        self.loader.join()
+        state = board.board_to_state()
+        return self.agent.choose_action(state, legal_actions(state))
+
+    def on_ai_move(self, generation, action):
+        if generation != self.generation:
+            return  # computed for a game that has been reset since
+        self.set_thinking(False)
+        if self.use_agent:
+            self.history.append((self.board.board_to_state(), action))
         self.make_move(action + 1)
-        self.check_game_end()
+        if not self.check_game_end():
+            self.ponder()
+
+    def ponder(self):
+        """
+        work out the reply to every human move in the background
+        """
+        self.ponder_cache = {}
+        if not PONDER:
+            return
+        self.ponder_cancelled = threading.Event()
+        board = copy.deepcopy(self.board)
+        legal_cells = [
+            cell
+            for cell, value in enumerate(board.board_to_state())
+            if value == board.EMPTY_CELL
+        ]
+
+        def replies(cancelled):
+            cache = {}
+            for cell in legal_cells:
+                if cancelled.is_set():
+                    return None
+                after = copy.deepcopy(board)
+                _, _, done, _ = after.step(cell + 1, "X")
+                if not done:
+                    cache[tuple(after.board_to_state())] = self.compute_move(after)
+            return cache
+
+        self.pool.start(
+            MoveTask(
+                replies, self.generation, self.ponder_cancelled, self.signals.pondered
+            )
+        )
+
+    def on_pondered(self, generation, cache):
+        if generation == self.generation:
+            self.ponder_cache = cache
+
+    def set_thinking(self, thinking):
+        # make_move / reset_game put the turn back in the status label
+        self.thinking = thinking
+        self.thinking_bar.setVisible(thinking)
+        if thinking:
+            self.status_label.setText("AI is thinking...")
+
+    def cancel_tasks(self):
+        """
+        drop the move / replies being computed, e.g. on reset
+        """
+        self.generation += 1
+        self.move_cancelled.set()
+        self.ponder_cancelled.set()
+        self.ponder_cache = {}
 
     def check_game_end(self):
         if self.board.check_winner("X"):
@@ -129,22 +314,43 @@ class TicTacToeGUI(QWidget):
         return False
 
     def game_over(self, message):
+        if self.learner is not None and self.history:
+            reward = (
+                1
+                if self.board.check_winner("O")
+                else -1 if self.board.check_winner("X") else 0
+            )
+            self.learner.submit(self.history, reward, self.board.board_to_state())
         QMessageBox.information(self, "Game Over", message)
         self.reset_game()
 
     def reset_game(self):
+        self.cancel_tasks()
+        self.set_thinking(False)
         self.board.reset_board()
         self.current_player = self.human_player
+        self.history = []
         self.status_label.setText("Your turn (X)")
         for button in self.buttons:
             button.setText("")
+        self.ponder()
 
 
 if __name__ == "__main__":
-    if not os.path.exists(resource_path("q_table.pkl")):
+    if not os.path.exists(resource_path(serving_model_file())):
+        from game import TicTacToeGame
+
         game = TicTacToeGame()
         game.train_ai()
-    app = QApplication(sys.argv)
-    ex = TicTacToeGUI()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe GUI")
+    parser.add_argument(
+        "--board", default="3x3:3", help="ROWSxCOLUMNS:K, e.g. 15x15:5 for gomoku"
+    )
+    args, qt_args = parser.parse_known_args()
+    rows, columns, k = parse_board_size(args.board)
+    app = QApplication(sys.argv[:1] + qt_args)
+    ex = TicTacToeGUI(rows=rows, columns=columns, k=k)
     ex.show()
     sys.exit(app.exec())
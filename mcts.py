@@ -0,0 +1,401 @@
+import math
+import random
+import time
+from array import array
+
+from board import Board
+from move import Move
+
+UNKNOWN, WIN, DRAW, OPEN = 0, 1, 2, 3
+
+_GEOMETRY = {}
+
+
+def geometry(rows, columns, k):
+    """
+    cached per board size: for every cell the bit masks of the k-long
+    windows through it (a stone only needs to check those) and the full mask
+    """
+    key = (rows, columns, k)
+    if key not in _GEOMETRY:
+        lines = [[] for _ in range(rows * columns)]
+        for row in range(rows):
+            for col in range(columns):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row, end_col = row + (k - 1) * dr, col + (k - 1) * dc
+                    if not (0 <= end_row < rows and 0 <= end_col < columns):
+                        continue
+                    cells = [(row + i * dr) * columns + col + i * dc for i in range(k)]
+                    mask = sum(1 << cell for cell in cells)
+                    for cell in cells:
+                        lines[cell].append(mask)
+        _GEOMETRY[key] = (
+            tuple(tuple(masks) for masks in lines),
+            (1 << rows * columns) - 1,
+        )
+    return _GEOMETRY[key]
+
+
+def board_bits(board):
+    """
+    (x_bits, o_bits, rows, columns, k) of Board, BitBoard or GridBoard
+    """
+    rows = getattr(board, "rows", 3)
+    columns = getattr(board, "columns", 3)
+    k = getattr(board, "k", 3)
+    x_bits = o_bits = 0
+    for row, cells in enumerate(board.game_board):
+        for col, cell in enumerate(cells):
+            if cell == Board.PLAYER_X:
+                x_bits |= 1 << (row * columns + col)
+            elif cell == Board.PLAYER_O:
+                o_bits |= 1 << (row * columns + col)
+    return x_bits, o_bits, rows, columns, k
+
+
+class NodePool:
+    """
+    Tree nodes as parallel typed arrays indexed by node id. The children of
+    a node are allocated together when it is expanded, so a node only
+    stores where its block starts and how long it is.
+    """
+
+    def __init__(self, capacity=200000):
+        self.capacity = capacity
+        self.parent = array("i", [0]) * capacity
+        self.first_child = array("i", [-1]) * capacity
+        self.num_children = array("H", [0]) * capacity
+        self.move = array("H", [0]) * capacity
+        self.status = array("B", [UNKNOWN]) * capacity
+        self.visits = array("I", [0]) * capacity
+        self.wins = array("d", [0.0]) * capacity
+        self.size = 0
+
+    def clear(self):
+        # only the used prefix needs resetting, with C-level slice fills
+        n = self.size
+        self.first_child[:n] = array("i", [-1]) * n
+        self.num_children[:n] = array("H", [0]) * n
+        self.status[:n] = array("B", [UNKNOWN]) * n
+        self.visits[:n] = array("I", [0]) * n
+        self.wins[:n] = array("d", [0.0]) * n
+        self.size = 0
+
+    def new_root(self):
+        self.clear()
+        self.size = 1
+        self.parent[0] = -1
+        self.status[0] = OPEN
+        return 0
+
+    def expand(self, node, cells):
+        """
+        allocate one child per cell; False when the pool is full
+        """
+        first = self.size
+        if first + len(cells) > self.capacity:
+            return False
+        for i, cell in enumerate(cells):
+            self.parent[first + i] = node
+            self.move[first + i] = cell
+        self.first_child[node] = first
+        self.num_children[node] = len(cells)
+        self.size += len(cells)
+        return True
+
+
+class MCTS:
+    """
+    UCT search over bitboards for any rows x columns / k-in-a-row game.
+
+    A move is searched for time_limit seconds or `iterations` iterations,
+    whichever ends first (either may be None). Each iteration walks down
+    the tree by UCB1, expands the leaf, plays a uniformly random game to
+    the end from there on the bitboards, and backs the result up the path.
+
+    The tree is kept between moves: when the next position is reached from
+    the previous root through moves that are already in the tree, that
+    subtree becomes the new root. With processes > 1 every process searches
+    its own tree with the same budget (root parallelism) and the visit
+    counts of the root moves are summed.
+    """
+
+    def __init__(
+        self,
+        time_limit=1.0,
+        iterations=None,
+        exploration=1.4,
+        capacity=200000,
+        processes=1,
+        seed=None,
+    ):
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.exploration = exploration
+        self.processes = processes
+        self.pool = NodePool(capacity)
+        self.rng = random.Random(seed)
+        self.rollouts = 0
+        self.search_time = 0.0
+        self.reused = 0  # searches that started from a kept subtree
+        self._geometry_key = None
+        self._executor = None
+
+    # tree reuse
+
+    def _set_root(self, x_bits, o_bits, geometry_key):
+        """
+        descend from the previous root to this position if the tree has
+        the moves in between, otherwise start a new tree
+        """
+        pool = self.pool
+        if self._geometry_key == geometry_key:
+            node, x, o = self._root, self._root_x, self._root_o
+            x_to_move = self._root_x_to_move
+            while (x, o) != (x_bits, o_bits) and pool.first_child[node] != -1:
+                placed = (x_bits & ~x) if x_to_move else (o_bits & ~o)
+                first = pool.first_child[node]
+                for child in range(first, first + pool.num_children[node]):
+                    if placed >> pool.move[child] & 1:
+                        break
+                else:
+                    break
+                bit = 1 << pool.move[child]
+                if x_to_move:
+                    x |= bit
+                else:
+                    o |= bit
+                node, x_to_move = child, not x_to_move
+            # a half-full pool is rebuilt rather than run out mid-search
+            if (x, o) == (x_bits, o_bits) and pool.size < pool.capacity // 2:
+                self._root, self._root_x, self._root_o = node, x, o
+                self._root_x_to_move = x_to_move
+                self.reused += 1
+                return
+        self._root = pool.new_root()
+        self._root_x, self._root_o = x_bits, o_bits
+        self._root_x_to_move = bin(x_bits).count("1") == bin(o_bits).count("1")
+        self._geometry_key = geometry_key
+
+    # search
+
+    def _rollout(self, x, o, x_to_move, lines, full):
+        """
+        random playout; returns 1 if X wins, -1 if O wins, 0 for a draw
+        """
+        occupied = x | o
+        cells = [cell for cell in range(full.bit_length()) if not occupied >> cell & 1]
+        self.rng.shuffle(cells)
+        for cell in cells:
+            bit = 1 << cell
+            if x_to_move:
+                x |= bit
+                for mask in lines[cell]:
+                    if x & mask == mask:
+                        return 1
+            else:
+                o |= bit
+                for mask in lines[cell]:
+                    if o & mask == mask:
+                        return -1
+            x_to_move = not x_to_move
+        return 0
+
+    def _iterate(self, lines, full):
+        pool = self.pool
+        first_child, num_children = pool.first_child, pool.num_children
+        visits, wins, move, status = pool.visits, pool.wins, pool.move, pool.status
+        node = self._root
+        x, o = self._root_x, self._root_o
+        x_to_move = self._root_x_to_move
+        path = [node]
+
+        while True:
+            if status[node] == UNKNOWN:
+                # first visit: did the move into this node end the game?
+                cell = move[node]
+                bits = o if x_to_move else x  # the player who just moved
+                if any(bits & mask == mask for mask in lines[cell]):
+                    status[node] = WIN
+                elif x | o == full:
+                    status[node] = DRAW
+                else:
+                    status[node] = OPEN
+            if status[node] != OPEN:
+                if status[node] == DRAW:
+                    result = 0
+                else:
+                    result = -1 if x_to_move else 1
+                break
+            if first_child[node] == -1:
+                if visits[node] == 0 and node != self._root:
+                    result = self._rollout(x, o, x_to_move, lines, full)
+                    break
+                occupied = x | o
+                cells = [c for c in range(full.bit_length()) if not occupied >> c & 1]
+                self.rng.shuffle(cells)
+                if not pool.expand(node, cells):
+                    result = self._rollout(x, o, x_to_move, lines, full)
+                    break
+
+            # UCB1 over the children block, unvisited children first
+            first = first_child[node]
+            log_n = math.log(visits[node] + 1)
+            best, best_score = first, -1.0
+            for child in range(first, first + num_children[node]):
+                n = visits[child]
+                if n == 0:
+                    best = child
+                    break
+                score = wins[child] / n + self.exploration * math.sqrt(log_n / n)
+                if score > best_score:
+                    best, best_score = child, score
+            node = best
+            bit = 1 << move[node]
+            if x_to_move:
+                x |= bit
+            else:
+                o |= bit
+            x_to_move = not x_to_move
+            path.append(node)
+
+        self.rollouts += 1
+        # wins are counted for the player who made the move into each node
+        mover_is_x = not x_to_move
+        for node in reversed(path):
+            visits[node] += 1
+            if result == 0:
+                wins[node] += 0.5
+            elif (result == 1) == mover_is_x:
+                wins[node] += 1.0
+            mover_is_x = not mover_is_x
+
+    def root_visits(self, x_bits, o_bits, rows=3, columns=3, k=3):
+        """
+        search this position within the budget; {cell: visits} of the root
+        """
+        lines, full = geometry(rows, columns, k)
+        self._set_root(x_bits, o_bits, (rows, columns, k))
+        start = time.perf_counter()
+        deadline = start + self.time_limit if self.time_limit else None
+        done = 0
+        while True:
+            self._iterate(lines, full)
+            done += 1
+            if self.iterations is not None and done >= self.iterations:
+                break
+            # the clock is read every 16 iterations
+            if deadline is not None and done % 16 == 0:
+                if time.perf_counter() >= deadline:
+                    break
+        self.search_time += time.perf_counter() - start
+
+        pool = self.pool
+        first = pool.first_child[self._root]
+        return {
+            pool.move[child]: pool.visits[child]
+            for child in range(first, first + pool.num_children[self._root])
+        }
+
+    def best_cell(self, x_bits, o_bits, rows=3, columns=3, k=3):
+        if self.processes > 1:
+            visits = self._parallel_visits(x_bits, o_bits, rows, columns, k)
+        else:
+            visits = self.root_visits(x_bits, o_bits, rows, columns, k)
+        return max(visits, key=visits.get)
+
+    def best_move(self, board):
+        """
+        Move for the player to move on board (X when both have as many
+        stones)
+        """
+        x_bits, o_bits, rows, columns, k = board_bits(board)
+        cell = self.best_cell(x_bits, o_bits, rows, columns, k)
+        return Move(cell + 1, rows, columns)
+
+    def _parallel_visits(self, x_bits, o_bits, rows, columns, k):
+        from concurrent.futures import ProcessPoolExecutor
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.processes)
+        settings = (self.time_limit, self.iterations, self.exploration)
+        futures = [
+            self._executor.submit(
+                _search_worker,
+                settings,
+                self.rng.randrange(1 << 30),
+                (x_bits, o_bits, rows, columns, k),
+            )
+            for _ in range(self.processes)
+        ]
+        total = {}
+        for future in futures:
+            visits, rollouts = future.result()
+            self.rollouts += rollouts
+            for cell, n in visits.items():
+                total[cell] = total.get(cell, 0) + n
+        return total
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _search_worker(settings, seed, position):
+    time_limit, iterations, exploration = settings
+    engine = MCTS(time_limit, iterations, exploration, seed=seed)
+    visits = engine.root_visits(*position)
+    return visits, engine.rollouts
+
+
+def _play(x_player, o_player, board):
+    """
+    one game; players are callables board -> Move. 1 X won, -1 O won, 0 draw
+    """
+    marker = "X"
+    while True:
+        player = x_player if marker == "X" else o_player
+        _, reward, done, _ = board.step(player(board), marker)
+        if done:
+            return 0 if reward == 0 else (1 if marker == "X" else -1)
+        marker = "O" if marker == "X" else "X"
+
+
+def benchmark(time_limit=0.2, games=20):
+    """
+    rollouts/sec per board size, then MCTS against the trained Q-table and
+    a random player on 3x3 (both sides, results from MCTS's side)
+    """
+    from grid_board import GridBoard
+    from player import Player
+    from train import QLearningAgent
+
+    for rows, columns, k in ((3, 3, 3), (9, 9, 5), (15, 15, 5)):
+        engine = MCTS(time_limit=1.0)
+        engine.best_move(GridBoard(rows, columns, k))
+        print(
+            f"{rows}x{columns}/{k}: {engine.rollouts / engine.search_time:,.0f} "
+            f"rollouts/sec"
+        )
+
+    agent = QLearningAgent()
+    agent.load_model("q_table.qtb")
+    q_player = Player(is_human=False, use_rl=True, agent=agent).get_move
+    random_player = Player(is_human=False).get_move
+    for name, opponent in (("q-table", q_player), ("random", random_player)):
+        results = []
+        for game in range(games):
+            engine = MCTS(time_limit=time_limit, seed=game)
+            if game % 2 == 0:
+                results.append(_play(engine.best_move, opponent, GridBoard()))
+            else:
+                results.append(-_play(opponent, engine.best_move, GridBoard()))
+        print(
+            f"MCTS vs {name}: win {results.count(1)} draw {results.count(0)} "
+            f"loss {results.count(-1)} ({time_limit}s per move)"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,180 @@
+import csv
+import json
+import os
+import time
+
+from player import Player
+from train import evaluate
+
+FIELDS = (
+    "games",
+    "elapsed",
+    "games_per_sec",
+    "x_win",
+    "draw",
+    "o_win",
+    "mean_abs_delta",
+    "q_size",
+    "random_win",
+    "random_draw",
+    "random_loss",
+    "perfect_win",
+    "perfect_draw",
+    "perfect_loss",
+    "converged",
+)
+
+
+def q_table_size(agent):
+    """
+    entries in a dict table, non-zero cells in a dense one
+    """
+    q_table = agent.q_table
+    if q_table is None:
+        return 0
+    if isinstance(q_table, dict):
+        return len(q_table)
+    return int((q_table != 0).sum())
+
+
+class TrainingMetrics:
+    """
+    Streaming self-play statistics, one row per window of games.
+
+    Only running sums for the current window are kept, so memory does not
+    grow with the number of games. A row holds the window's X win / draw /
+    O win rates, games/sec, mean absolute Q-value change per update and the
+    table size. Every eval_every windows the greedy agent also plays
+    eval_games against a random Player and a perfect (solver) Player, half
+    as X and half as O; converged becomes True once it has lost no game to
+    either opponent in `patience` evaluations in a row.
+
+    Rows go to filename as CSV (*.csv) or JSON lines (anything else).
+    """
+
+    def __init__(
+        self,
+        agent,
+        window=1000,
+        filename=None,
+        eval_every=10,
+        eval_games=200,
+        patience=3,
+        clock=time.perf_counter,
+    ):
+        self.agent = agent
+        self.window = window
+        self.filename = filename
+        self.eval_every = eval_every
+        self.eval_games = eval_games
+        self.patience = patience
+        self.clock = clock
+
+        self.games = 0
+        self.total_reward = 0
+        self.windows = 0
+        self.clean_evals = 0
+        self.last_row = None
+        self._start = self._window_start = clock()
+        self._reset_window()
+        self._opponents = None
+
+    @property
+    def mean_reward(self):
+        return self.total_reward / self.games if self.games else 0.0
+
+    @property
+    def converged(self):
+        return self.clean_evals >= self.patience
+
+    def _reset_window(self):
+        self._games = self._x_wins = self._o_wins = 0
+        self._delta = 0.0
+        self._updates = 0
+
+    def record(self, final_reward, abs_delta=0.0, updates=0):
+        """
+        one finished game: final_reward from X's side, summed absolute
+        Q change of its updates and how many updates it made
+        returns the row when this game closed a window, else None
+        """
+        self.games += 1
+        self.total_reward += final_reward
+        self._games += 1
+        if final_reward > 0:
+            self._x_wins += 1
+        elif final_reward < 0:
+            self._o_wins += 1
+        self._delta += abs_delta
+        self._updates += updates
+        if self._games >= self.window:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """
+        close the current window (if it has any game) and write its row
+        """
+        if not self._games:
+            return None
+        now = self.clock()
+        games = self._games
+        row = dict.fromkeys(FIELDS, "")
+        row.update(
+            games=self.games,
+            elapsed=round(now - self._start, 3),
+            games_per_sec=round(games / max(now - self._window_start, 1e-9), 1),
+            x_win=round(self._x_wins / games, 4),
+            draw=round((games - self._x_wins - self._o_wins) / games, 4),
+            o_win=round(self._o_wins / games, 4),
+            mean_abs_delta=round(self._delta / max(self._updates, 1), 6),
+            q_size=q_table_size(self.agent),
+        )
+        self.windows += 1
+        if self.eval_every and self.windows % self.eval_every == 0:
+            row.update(self.evaluate())
+            row["converged"] = self.converged
+        self._write(row)
+        self.last_row = row
+        self._reset_window()
+        # evaluation time is not training time
+        self._window_start = self.clock()
+        return row
+
+    def evaluate(self):
+        if self._opponents is None:
+            self._opponents = {
+                "random": Player(is_human=False),
+                "perfect": Player(is_human=False, use_solver=True),
+            }
+        result = {}
+        lost = False
+        for name, opponent in self._opponents.items():
+            half = self.eval_games // 2
+            rates = [0.0, 0.0, 0.0]
+            for marker, games in (("X", half), ("O", self.eval_games - half)):
+                for i, rate in enumerate(
+                    evaluate(self.agent, opponent, games, agent_marker=marker)
+                ):
+                    rates[i] += rate * games / self.eval_games
+            for i, outcome in enumerate(("win", "draw", "loss")):
+                result[f"{name}_{outcome}"] = round(rates[i], 4)
+            lost = lost or rates[2] > 0
+        self.clean_evals = 0 if lost else self.clean_evals + 1
+        return result
+
+    def _write(self, row):
+        if self.filename is None:
+            return
+        if self.filename.endswith(".csv"):
+            new = not os.path.exists(self.filename) or not os.path.getsize(
+                self.filename
+            )
+            with open(self.filename, "a", newline="") as f:
+                writer = csv.DictWriter(f, FIELDS)
+                if new:
+                    writer.writeheader()
+                writer.writerow(row)
+        else:
+            with open(self.filename, "a") as f:
+                f.write(json.dumps({k: v for k, v in row.items() if v != ""}) + "\n")
@@ -0,0 +1,205 @@
+import struct
+import sys
+import time
+import zlib
+from array import array
+from itertools import islice, product
+
+from board import Board, state_index
+
+MAGIC = b"TTTQ"
+VERSION = 1
+FLAG_ZLIB = 1
+# magic, version, flags, number of entries
+HEADER = struct.Struct("<4sHHI")
+TRAILER = struct.Struct("<I")  # crc32 of the uncompressed body
+# the body is a run of blocks of up to BLOCK_RECORDS entries, each block
+# stored column-wise: uint16 state ids (base-3, < 3**9), uint8 actions,
+# float32 Q-values, all little-endian
+BLOCK_RECORDS = 4096
+RECORD_SIZE = 2 + 1 + 4
+
+_STATES = None
+
+
+def _all_states():
+    # state tuple for every state id, cell 0 varies fastest like state_index
+    global _STATES
+    if _STATES is None:
+        cells = (Board.EMPTY_CELL, Board.PLAYER_X, Board.PLAYER_O)
+        _STATES = [state[::-1] for state in product(cells, repeat=9)]
+    return _STATES
+
+
+def _column(typecode, data):
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _pack_block(entries):
+    states = _column("H", b"")
+    states.extend(state_index(state) for (state, _), _ in entries)
+    actions = bytes(action for (_, action), _ in entries)
+    values = _column("f", b"")
+    values.extend(value for _, value in entries)
+    if sys.byteorder == "big":
+        states.byteswap()
+        values.byteswap()
+    return states.tobytes() + actions + values.tobytes()
+
+
+def _unpack_block(data, n):
+    states = _column("H", data[: 2 * n])
+    actions = data[2 * n : 3 * n]
+    values = _column("f", data[3 * n :])
+    return zip(states, actions, values)
+
+
+def is_q_table_file(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_q_table(filename, q_table, compress=True):
+    """
+    stream a {(state, action): value} dict to disk one block at a time
+    """
+    compressor = zlib.compressobj(6) if compress else None
+    crc = 0
+    entries = iter(q_table.items())
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, FLAG_ZLIB if compress else 0, len(q_table)))
+        while True:
+            block = list(islice(entries, BLOCK_RECORDS))
+            if not block:
+                break
+            data = _pack_block(block)
+            crc = zlib.crc32(data, crc)
+            f.write(compressor.compress(data) if compressor else data)
+        if compressor:
+            f.write(compressor.flush())
+        f.write(TRAILER.pack(crc))
+
+
+def iter_q_table(filename):
+    """
+    yield (state_index, action, value) block by block while reading;
+    raises ValueError on a bad header, truncation or a bad checksum
+    """
+    try:
+        yield from _iter_q_table(filename)
+    except zlib.error as e:
+        raise ValueError(f"{filename} is corrupt: {e}") from e
+
+
+def _iter_q_table(filename):
+    with open(filename, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{filename} is truncated")
+        magic, version, flags, count = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a Q-table file")
+        if version > VERSION:
+            raise ValueError(f"{filename} needs format version {version}")
+
+        decompressor = zlib.decompressobj() if flags & FLAG_ZLIB else None
+        crc = 0
+        remaining = count
+        pending = b""  # decoded bytes not consumed by a block yet
+        tail = b""  # last raw bytes seen, the trailer once the file ends
+        eof = False
+        while remaining:
+            n = min(BLOCK_RECORDS, remaining)
+            while len(pending) < n * RECORD_SIZE and not eof:
+                raw = f.read(BLOCK_RECORDS * RECORD_SIZE)
+                if not raw:
+                    eof = True
+                    if decompressor:
+                        pending += decompressor.flush()
+                    break
+                raw = tail + raw
+                raw, tail = raw[: -TRAILER.size], raw[-TRAILER.size :]
+                pending += decompressor.decompress(raw) if decompressor else raw
+            if len(pending) < n * RECORD_SIZE:
+                raise ValueError(f"{filename} is truncated")
+            data, pending = pending[: n * RECORD_SIZE], pending[n * RECORD_SIZE :]
+            crc = zlib.crc32(data, crc)
+            yield from _unpack_block(data, n)
+            remaining -= n
+
+        # everything after the last block is the trailer
+        rest = tail + f.read()
+        rest, trailer = rest[: -TRAILER.size], rest[-TRAILER.size :]
+        if decompressor and not eof:
+            pending += decompressor.decompress(rest) + decompressor.flush()
+        elif not decompressor:
+            pending += rest
+        if pending or len(trailer) != TRAILER.size:
+            raise ValueError(f"{filename} has trailing data or is truncated")
+        if TRAILER.unpack(trailer)[0] != crc:
+            raise ValueError(f"{filename} failed its checksum")
+
+
+def read_q_table(filename):
+    states = _all_states()
+    return {
+        (states[index], action): value
+        for index, action, value in iter_q_table(filename)
+    }
+
+
+def migrate(src="q_table.pkl", dst="q_table.qtb", compress=True):
+    """
+    convert a pickle written by QLearningAgent.save_model (trusted input only)
+    """
+    import pickle
+
+    with open(src, "rb") as f:
+        q_table = pickle.load(f)
+    write_q_table(dst, q_table, compress)
+    print(f"{len(q_table)} entries: {src} -> {dst}")
+
+
+def benchmark(pickle_file="q_table.pkl", repeat=20):
+    import os
+    import pickle
+    import tempfile
+
+    global _STATES
+
+    with open(pickle_file, "rb") as f:
+        q_table = pickle.load(f)
+    tmp = tempfile.mkdtemp()
+    results = {}
+    for name, compress in (("raw", False), ("zlib", True)):
+        path = os.path.join(tmp, f"{name}.qtb")
+        write_q_table(path, q_table, compress)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            _STATES = None  # include the one-off state table in every load
+            read_q_table(path)
+        results[name] = ((time.perf_counter() - start) / repeat, os.path.getsize(path))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with open(pickle_file, "rb") as f:
+            pickle.load(f)
+    results["pickle"] = (
+        (time.perf_counter() - start) / repeat,
+        os.path.getsize(pickle_file),
+    )
+
+    for name, (seconds, size) in results.items():
+        print(f"{name:>6}: {seconds * 1000:6.2f} ms load, {size / 1024:6.1f} KB")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        benchmark(*sys.argv[2:3])
+    else:
+        migrate(*sys.argv[1:3])
@@ -1,26 +1,19 @@
 class Move:
-    def __init__(self, value) -> None:
+    def __init__(self, value, rows=3, columns=3) -> None:
         self._value = value
+        # positions run 1..rows*columns, row-major
+        self._rows = rows
+        self._columns = columns
 
     @property
     def value(self):
         return self._value
 
     def is_valid(self):
-        return 1 <= self._value <= 9
+        return 1 <= self._value <= self._rows * self._columns
 
     def get_row(self):
-        if self._value in (1, 2, 3):
-            return 0
-        elif self._value in (4, 5, 6):
-            return 1
-        else:
-            return 2
+        return (self._value - 1) // self._columns
 
     def get_column(self):
-        if self._value in (1, 4, 7):
-            return 0
-        elif self._value in (2, 5, 8):
-            return 1
-        else:
-            return 2
+        return (self._value - 1) % self._columns
@@ -0,0 +1,115 @@
+import copy
+import queue
+import threading
+import time
+
+from checkpoint_log import CheckpointLog
+from train import update_from_live_game
+
+
+class OnlineLearner:
+    """
+    Learns from finished live games without blocking the caller.
+
+    submit() only queues the game. A daemon thread applies the updates in
+    batches to a private copy of the serving agent, publishes a snapshot of
+    that copy by swapping agent.q_table (one reference assignment, so
+    readers see either the old or the new table) and on a timer appends the
+    entries it changed to a CheckpointLog for checkpoint_file.
+
+    With a replay.ReplayBuffer the games are added to it and each batch of
+    games is followed by one minibatch update per game instead of
+    unwinding them directly.
+    """
+
+    def __init__(
+        self,
+        agent,
+        checkpoint_file,
+        batch_size=32,
+        publish_interval=1.0,
+        checkpoint_interval=5.0,
+        log=None,
+        replay=None,
+    ):
+        self.agent = agent
+        self.checkpoint_file = checkpoint_file
+        self.log = log or CheckpointLog(checkpoint_file)
+        self.replay = replay
+        self.batch_size = batch_size
+        self.publish_interval = publish_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.games_learned = 0
+
+        self._learner = copy.copy(agent)
+        self._learner.q_table = copy.copy(agent.q_table)
+        self.log.track(self._learner)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._unpublished = 0
+        self._unsaved = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, game_history, final_reward, next_state):
+        self._queue.put((list(game_history), final_reward, next_state))
+
+    def stop(self):
+        """
+        drain the queue, publish and write a final checkpoint
+        """
+        self._stop.set()
+        self._thread.join()
+        self.log.wait()
+
+    def _run(self):
+        last_publish = last_checkpoint = time.monotonic()
+        while True:
+            batch = self._take_batch()
+            for game_history, final_reward, next_state in batch:
+                if self.replay is not None:
+                    self.replay.add_live_game(
+                        game_history, final_reward, next_state, self._learner.gamma
+                    )
+                    self.replay.train(self._learner)
+                else:
+                    update_from_live_game(
+                        self._learner, game_history, final_reward, next_state
+                    )
+            self._unpublished += len(batch)
+            self.games_learned += len(batch)
+
+            now = time.monotonic()
+            stopping = self._stop.is_set() and self._queue.empty()
+            if self._unpublished and (
+                stopping or now - last_publish >= self.publish_interval
+            ):
+                self._publish()
+                last_publish = now
+            if self._unsaved and (
+                stopping or now - last_checkpoint >= self.checkpoint_interval
+            ):
+                self._checkpoint()
+                last_checkpoint = now
+            if stopping:
+                return
+
+    def _take_batch(self):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=0.1))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _publish(self):
+        self.agent.q_table = copy.copy(self._learner.q_table)
+        self._unsaved += self._unpublished
+        self._unpublished = 0
+
+    def _checkpoint(self):
+        # runs on the learner thread, so the private table is not changing
+        self.log.save(self._learner)
+        self._unsaved = 0
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import random
+import time
+
+from tqdm import tqdm
+
+from bitboard import make_board
+from train import play_self_training_game, update_from_history
+
+MERGE_MODES = ("average", "delta")
+
+
+def _play_shard(args):
+    """
+    worker: play num_games against a private copy of the master table
+    """
+    agent, num_games, use_bitboard, seed = args
+    random.seed(seed)
+    board = make_board(use_bitboard)
+    for _ in range(num_games):
+        board.reset_board()
+        game_history, final_reward = play_self_training_game(agent, board)
+        update_from_history(agent, game_history, final_reward, board.board_to_state())
+    return agent.q_table
+
+
+def merge_tables(master, tables, merge="average"):
+    """
+    average: mean of the worker tables
+    delta:   master + sum of each worker's change since the last sync
+    works for dict tables and numpy arrays alike
+    """
+    if merge not in MERGE_MODES:
+        raise ValueError(f"Unknown merge mode: {merge}")
+
+    if not isinstance(master, dict):
+        if merge == "average":
+            return sum(tables) / len(tables)
+        return master + sum(table - master for table in tables)
+
+    merged = dict(master)
+    if merge == "average":
+        keys = set().union(*tables)
+        for key in keys:
+            default = master.get(key, 0.0)
+            merged[key] = sum(table.get(key, default) for table in tables) / len(tables)
+    else:
+        for table in tables:
+            for key, value in table.items():
+                delta = value - master.get(key, 0.0)
+                if delta:
+                    merged[key] = merged.get(key, 0.0) + delta
+    return merged
+
+
+def train_parallel(
+    agent,
+    num_games=10000,
+    num_workers=None,
+    sync_interval=1000,
+    merge="average",
+    use_bitboard=True,
+    save=True,
+):
+    """
+    shard self-play across a process pool; every worker plays sync_interval
+    games on its own copy of the table, then the master merges the copies
+    and hands the result out for the next round
+    """
+    num_workers = num_workers or os.cpu_count()
+    per_round = num_workers * sync_interval
+    rounds = -(-num_games // per_round)
+    # workers explore the book positions too (and do not pickle the book)
+    book = getattr(agent, "book", None)
+    agent.book = None
+
+    with multiprocessing.Pool(num_workers) as pool:
+        remaining = num_games
+        for _ in tqdm(range(rounds), desc="Parallel Training"):
+            shards = [
+                min(sync_interval, max(remaining - i * sync_interval, 0))
+                for i in range(num_workers)
+            ]
+            shards = [n for n in shards if n]
+            remaining -= sum(shards)
+            tables = pool.map(
+                _play_shard,
+                [(agent, n, use_bitboard, random.randrange(2**32)) for n in shards],
+            )
+            agent.q_table = merge_tables(agent.q_table, tables, merge)
+    agent.book = book
+
+    if save:
+        agent.save_model()
+
+
+def benchmark_scaling(num_games=100000, max_workers=None, sync_interval=5000):
+    """
+    games/sec of train_parallel for 1..max_workers processes
+    """
+    from agents import make_agent
+
+    max_workers = max_workers or os.cpu_count()
+    results = {}
+    for workers in range(1, max_workers + 1):
+        agent = make_agent("dict")
+        start = time.perf_counter()
+        train_parallel(agent, num_games, workers, sync_interval, save=False)
+        rate = num_games / (time.perf_counter() - start)
+        results[workers] = rate
+        print(
+            f"{workers:>2} workers: {rate:,.0f} games/sec "
+            f"({rate / results[1]:.2f}x)"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_scaling()
@@ -1,18 +1,43 @@
 import random
 
-from board import Board
 from move import Move
+from transitions import legal_actions
+
+
+def _board_size(board):
+    # GridBoard knows its size, the 3x3 boards do not
+    if board is None:
+        return 3, 3
+    return getattr(board, "rows", 3), getattr(board, "columns", 3)
 
 
 class Player:
     PLAYER_MARKER = "X"
     COMPUTER_MARKER = "O"
 
-    def __init__(self, is_human=True, use_rl=False, q_table=None):
+    def __init__(
+        self,
+        is_human=True,
+        use_rl=False,
+        q_table=None,
+        agent=None,
+        use_solver=False,
+        use_mcts=False,
+        mcts=None,
+        book=None,
+    ):
         self._is_human = is_human
         self._use_rl = use_rl
+        self._use_solver = use_solver
+        self._use_mcts = use_mcts or mcts is not None
+        # mcts.MCTS engine, created on the first move when not given
+        self.mcts = mcts
         self._marker = self.PLAYER_MARKER if is_human else self.COMPUTER_MARKER
         self.q_table = q_table
+        # any agent with greedy_action(); takes precedence over a raw q_table dict
+        self.agent = agent
+        # book.Book, consulted before the agent / q_table
+        self.book = book if book is not None else getattr(agent, "book", None)
 
     @property
     def is_human(self):
@@ -24,34 +49,65 @@ class Player:
 
     def get_move(self, board):
         if self.is_human:
-            return self.get_human_move()
+            return self.get_human_move(board)
+        elif self._use_solver:
+            return self.get_solver_move(board)
+        elif self._use_mcts:
+            return self.get_mcts_move(board)
         elif self._use_rl:
             return self.get_rl_move(board)
         else:
             return self.get_random_move(board)
 
-    def get_human_move(self):
+    def get_human_move(self, board=None):
+        rows, columns = _board_size(board)
         while True:
             try:
-                user_input = int(input("Please enter your move (1-9): "))
-                move = Move(user_input)
+                user_input = int(
+                    input(f"Please enter your move (1-{rows * columns}): ")
+                )
+                move = Move(user_input, rows, columns)
                 if move.is_valid():
                     return move
             except ValueError:
                 pass
-            print("Invalid input. Please enter a number between 1 and 9.")
+            print(
+                f"Invalid input. Please enter a number between 1 and {rows * columns}."
+            )
 
     def get_random_move(self, board):
-        available_positions = [
-            i for i in range(9) if board.game_board[i // 3][i % 3] == Board.EMPTY_CELL
-        ]
-        return Move(random.choice(available_positions) + 1)
+        rows, columns = _board_size(board)
+        if (rows, columns) == (3, 3):
+            available_positions = legal_actions(board.board_to_state())
+        else:
+            available_positions = board.available_actions()
+        return Move(random.choice(available_positions) + 1, rows, columns)
 
     def get_rl_move(self, board):
         state = tuple(board.board_to_state())
-        available_actions = [i for i in range(9) if state[i] == Board.EMPTY_CELL]
+        available_actions = legal_actions(state)
+        if self.book is not None:
+            action = self.book.lookup(state, available_actions)
+            if action is not None:
+                return Move(action + 1)
+        if self.agent is not None:
+            return Move(self.agent.greedy_action(state, available_actions) + 1)
+
         q_values = [self.q_table.get((state, a), 0.0) for a in available_actions]
         max_q = max(q_values)
         best_actions = [a for a, q in zip(available_actions, q_values) if q == max_q]
         action = random.choice(best_actions)
         return Move(action + 1)
+
+    def get_solver_move(self, board):
+        from solver import get_solver, state_to_bits
+
+        best_actions = get_solver().best_actions(*state_to_bits(board.board_to_state()))
+        return Move(random.choice(best_actions) + 1)
+
+    def get_mcts_move(self, board):
+        if self.mcts is None:
+            from mcts import MCTS
+
+            self.mcts = MCTS()
+        return self.mcts.best_move(board)
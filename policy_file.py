@@ -0,0 +1,132 @@
+import mmap
+import random
+import struct
+import time
+
+from board import NUM_STATES, Board, index_to_state, state_index
+
+MAGIC = b"TTTP"
+VERSION = 1
+# magic, version, reserved, number of states
+HEADER = struct.Struct("<4sHHI")
+NO_MOVE = -1
+
+
+def _layout(count):
+    # int8 moves right after the header, float32 values 4-byte aligned
+    moves_offset = HEADER.size
+    values_offset = (moves_offset + count + 3) // 4 * 4
+    return moves_offset, values_offset, values_offset + 4 * count
+
+
+def export_policy(agent, filename="policy.bin"):
+    """
+    compile an agent's greedy policy into one (move, value) pair per state id
+    """
+    moves = bytearray(NUM_STATES)
+    values = [0.0] * NUM_STATES
+    for index in range(NUM_STATES):
+        state = index_to_state(index)
+        available_actions = [i for i in range(9) if state[i] == Board.EMPTY_CELL]
+        if not available_actions:
+            moves[index] = NO_MOVE & 0xFF
+            continue
+        action = agent.greedy_action(state, available_actions)
+        moves[index] = action
+        values[index] = agent.get_q_value(state, action)
+
+    moves_offset, values_offset, size = _layout(NUM_STATES)
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, NUM_STATES))
+        f.write(moves)
+        f.write(b"\0" * (values_offset - moves_offset - NUM_STATES))
+        f.write(struct.pack(f"<{NUM_STATES}f", *values))
+    print(f"Policy written to {filename} ({size} bytes).")
+
+
+class PolicyFile:
+    """
+    read-only mmap of a file written by export_policy; every process that
+    maps the same file shares one page-cache copy
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{filename} is not a version {VERSION} policy file")
+        moves_offset, values_offset, size = _layout(count)
+        view = memoryview(self._mmap)
+        self.moves = view[moves_offset : moves_offset + count].cast("b")
+        self.values = view[values_offset:size].cast("f")
+
+
+class PolicyAgent:
+    """
+    Serves moves from a PolicyFile: one array read per decision. Read-only,
+    so update_q_table and save_model are no-ops.
+    """
+
+    def __init__(self, alpha=0.0, gamma=0.9, epsilon=0.0):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.q_table = None
+        self.policy = None
+
+    def greedy_action(self, state, available_actions):
+        action = self.policy.moves[state_index(state)] if self.policy else NO_MOVE
+        if action == NO_MOVE or state[action] != Board.EMPTY_CELL:
+            return random.choice(available_actions)
+        return action
+
+    def choose_action(self, state, available_actions):
+        return self.greedy_action(state, available_actions)
+
+    def get_q_value(self, state, action):
+        if self.policy is None:
+            return 0.0
+        index = state_index(state)
+        return self.policy.values[index] if self.policy.moves[index] == action else 0.0
+
+    def update_q_table(self, state, action, reward, next_state, available_actions):
+        return 0.0
+
+    def save_model(self, filename=None):
+        pass
+
+    def load_model(self, filename="policy.bin"):
+        try:
+            self.policy = PolicyFile(filename)
+            print("Model loaded successfully.")
+        except FileNotFoundError:
+            print("No existing model found. Starting with a new model.")
+
+
+if __name__ == "__main__":
+    import sys
+
+    from train import QLearningAgent
+
+    src = sys.argv[1] if len(sys.argv) > 1 else "q_table.qtb"
+    dst = sys.argv[2] if len(sys.argv) > 2 else "policy.bin"
+    agent = QLearningAgent()
+    agent.load_model(src)
+    export_policy(agent, dst)
+
+    start = time.perf_counter()
+    agent.load_model(src)
+    pickle_load = time.perf_counter() - start
+    start = time.perf_counter()
+    policy_agent = PolicyAgent()
+    policy_agent.load_model(dst)
+    mmap_load = time.perf_counter() - start
+    print(f"load: pickle {pickle_load * 1000:.2f} ms, mmap {mmap_load * 1000:.3f} ms")
+
+    state = [Board.EMPTY_CELL] * 9
+    start = time.perf_counter()
+    for _ in range(100000):
+        policy_agent.greedy_action(state, None)
+    print(f"per-move: {(time.perf_counter() - start) * 10:.2f} us")
@@ -0,0 +1,213 @@
+import numpy as np
+
+from board import Board, state_index
+from model_format import _all_states
+from transitions import legal_mask
+
+
+class PrioritySums:
+    """
+    Two-level sum tree for proportional sampling: priorities are kept in
+    blocks of about sqrt(capacity) entries with one running sum per block.
+    A draw first picks a block from the block sums, then an entry inside
+    it, so update and find are a few NumPy calls on short arrays however
+    large the buffer is (a binary tree needs one call per level).
+    """
+
+    def __init__(self, capacity):
+        self.block = max(16, int(capacity**0.5))
+        num_blocks = -(-capacity // self.block)
+        self.values = np.zeros(num_blocks * self.block)
+        self.sums = np.zeros(num_blocks)
+
+    @property
+    def total(self):
+        return self.sums.sum()
+
+    def get(self, positions):
+        return self.values[positions]
+
+    def update(self, positions, values):
+        self.values[positions] = values
+        blocks = positions // self.block
+        # recomputed from the entries, so rounding errors never accumulate
+        self.sums[blocks] = self.values.reshape(-1, self.block)[blocks].sum(axis=1)
+
+    def find(self, draws):
+        """
+        entry whose prefix-sum range contains each draw in [0, total)
+        """
+        cumulative = np.cumsum(self.sums)
+        blocks = np.searchsorted(cumulative, draws, side="right")
+        blocks = np.minimum(blocks, len(self.sums) - 1)
+        offsets = draws - (cumulative[blocks] - self.sums[blocks])
+        within = np.cumsum(self.values.reshape(-1, self.block)[blocks], axis=1)
+        entries = (within <= offsets[:, None]).sum(axis=1)
+        return blocks * self.block + np.minimum(entries, self.block - 1)
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring buffer of transitions stored as parallel arrays:
+    state id, action, reward, next-state id and the next state's legal
+    moves as a 9-bit mask. When full the oldest transition is overwritten.
+    train() applies one minibatch of batch_size sampled transitions, as a
+    single vectorized step for agents with update_batch (dense) and
+    through update_q_table otherwise.
+
+    Transitions follow update_from_history / update_from_live_game: every
+    move of a finished game gets the (discounted, per-player) final reward
+    and the terminal board as next state.
+
+    With prioritized=True minibatches are drawn with probability
+    proportional to (|TD error| + eps) ** priority_alpha, new transitions
+    get the current maximum priority, and updates are scaled by importance
+    weights (N * P) ** -beta normalised to at most 1.
+    """
+
+    def __init__(
+        self,
+        capacity=100000,
+        batch_size=32,
+        prioritized=False,
+        priority_alpha=0.6,
+        beta=0.4,
+        eps=1e-3,
+        seed=None,
+    ):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.prioritized = prioritized
+        self.priority_alpha = priority_alpha
+        self.beta = beta
+        self.eps = eps
+        self.rng = np.random.default_rng(seed)
+
+        self.state = np.zeros(capacity, dtype=np.int32)
+        self.action = np.zeros(capacity, dtype=np.int8)
+        self.reward = np.zeros(capacity, dtype=np.float32)
+        self.next_state = np.zeros(capacity, dtype=np.int32)
+        self.next_legal = np.zeros(capacity, dtype=np.uint16)
+        # priority ** priority_alpha per transition
+        self.priorities = PrioritySums(capacity) if prioritized else None
+        self.size = 0
+        self._next = 0
+        self._max_priority = 1.0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, indices, actions, rewards, next_index, next_legal):
+        """
+        transitions sharing one next state (the terminal board of a game)
+        """
+        if not len(indices):
+            return
+        positions = (self._next + np.arange(len(indices))) % self.capacity
+        self.state[positions] = indices
+        self.action[positions] = actions
+        self.reward[positions] = rewards
+        self.next_state[positions] = next_index
+        self.next_legal[positions] = next_legal
+        if self.priorities is not None:
+            self.priorities.update(positions, self._max_priority**self.priority_alpha)
+        self._next = int(positions[-1] + 1) % self.capacity
+        self.size = min(self.size + len(indices), self.capacity)
+
+    def add_self_play(self, game_history, final_reward, next_state, gamma):
+        """
+        a play_self_training_game result; final_reward is from X's side
+        """
+        rewards = []
+        for _, _, player in reversed(game_history):
+            rewards.append(final_reward if player == Board.PLAYER_X else -final_reward)
+            final_reward *= gamma
+        self.add(
+            [state_index(state) for state, _, _ in reversed(game_history)],
+            [action for _, action, _ in reversed(game_history)],
+            rewards,
+            state_index(next_state),
+            legal_mask(next_state),
+        )
+
+    def add_live_game(self, game_history, final_reward, next_state, gamma):
+        """
+        (state, action) pairs of one side, final_reward from that side
+        """
+        self.add(
+            [state_index(state) for state, _ in game_history],
+            [action for _, action in game_history],
+            final_reward * gamma ** np.arange(len(game_history) - 1, -1, -1),
+            state_index(next_state),
+            legal_mask(next_state),
+        )
+
+    def sample(self, batch_size):
+        """
+        (positions, importance weights) of batch_size transitions, drawn with
+        replacement
+        """
+        if self.priorities is None:
+            return self.rng.integers(0, self.size, batch_size), None
+        total = self.priorities.total
+        draws = self.rng.random(batch_size) * total
+        positions = np.minimum(self.priorities.find(draws), self.size - 1)
+        probs = self.priorities.get(positions) / total
+        weights = (self.size * probs) ** -self.beta
+        return positions, weights / weights.max()
+
+    def train(self, agent, batch_size=None):
+        """
+        one minibatch of Q-learning updates; returns the summed absolute
+        change of the updated Q-values
+        """
+        if not self.size:
+            return 0.0
+        positions, weights = self.sample(batch_size or self.batch_size)
+        if hasattr(agent, "update_batch"):
+            td, delta = agent.update_batch(
+                self.state[positions],
+                self.action[positions],
+                self.reward[positions],
+                self.next_state[positions],
+                self.next_legal[positions] != 0,
+                weights,
+            )
+        else:
+            td, delta = self._train_loop(agent, positions, weights)
+        if self.priorities is not None:
+            priority = np.abs(td) + self.eps
+            self.priorities.update(positions, priority**self.priority_alpha)
+            self._max_priority = max(self._max_priority, float(priority.max()))
+        return delta
+
+    def _train_loop(self, agent, positions, weights):
+        # dict-backed agents: one update_q_table per transition, the TD
+        # error is taken before it, since the step size may be per entry
+        # (visit counts) rather than agent.alpha
+        states = _all_states()
+        td = np.zeros(len(positions), dtype=np.float32)
+        total_delta = 0.0
+        alpha = agent.alpha
+        for n, i in enumerate(positions.tolist()):
+            legal = int(self.next_legal[i])
+            available_actions = [a for a in range(9) if legal >> a & 1]
+            state, action = states[self.state[i]], int(self.action[i])
+            next_state = states[self.next_state[i]]
+            next_max_q = max(
+                (agent.get_q_value(next_state, a) for a in available_actions),
+                default=0.0,
+            )
+            td[n] = (
+                float(self.reward[i])
+                + agent.gamma * next_max_q
+                - agent.get_q_value(state, action)
+            )
+            if weights is not None:
+                agent.alpha = alpha * float(weights[n])
+            delta = agent.update_q_table(
+                state, action, float(self.reward[i]), next_state, available_actions
+            )
+            total_delta += abs(delta)
+        agent.alpha = alpha
+        return td, total_delta
@@ -0,0 +1,142 @@
+import math
+
+import numpy as np
+
+from board import state_index
+
+
+def constant(value):
+    return lambda games: value
+
+
+def linear(start, end, num_games):
+    """
+    start -> end over num_games games, then end
+    """
+    return lambda games: start + (end - start) * min(games / num_games, 1.0)
+
+
+def exponential(start, end, half_life):
+    """
+    start decays towards end, halving the distance every half_life games
+    """
+    return lambda games: end + (start - end) * 0.5 ** (games / half_life)
+
+
+def reachable_states():
+    """
+    every non-terminal position reachable from the empty board
+    """
+    from solver import _bits_to_state, _reachable, get_solver
+
+    return [tuple(_bits_to_state(x, o)) for x, o in _reachable(get_solver())]
+
+
+def greedy_policy(agent, states, indices=None):
+    """
+    greedy action for each state, ties broken towards the lowest cell so
+    that unchanged Q-values always give the same action
+    """
+    if hasattr(agent, "masked_rows"):
+        return agent.masked_rows(indices).argmax(axis=1)
+    policy = []
+    for state in states:
+        best_q, best = -math.inf, None
+        for action, cell in enumerate(state):
+            if cell == 0:
+                q = agent.get_q_value(state, action)
+                if q > best_q:
+                    best_q, best = q, action
+        policy.append(best)
+    return np.array(policy)
+
+
+class TrainingScheduler:
+    """
+    Drives epsilon / alpha from schedules and stops training once the
+    policy is stable.
+
+    epsilon and alpha are callables of the number of games played (see
+    constant, linear, exponential); None keeps the agent's value. With
+    visit_counts the agent's per-entry rate max(alpha, n ** -omega) is used
+    (QLearningAgent.track_visits) and the alpha schedule becomes its floor.
+
+    Every check_every games the greedy action of every reachable position
+    is recomputed; `stability` is the fraction that changed since the
+    previous check. Training stops after `patience` checks in a row at or
+    below threshold. Near-tied Q-values keep flipping while epsilon > 0,
+    so the fraction rarely goes below ~1.5%; the default threshold sits
+    just above that.
+    """
+
+    def __init__(
+        self,
+        epsilon=None,
+        alpha=None,
+        visit_counts=False,
+        visit_omega=0.6,
+        check_every=5000,
+        threshold=0.025,
+        patience=3,
+    ):
+        self.epsilon = epsilon
+        self.alpha = alpha
+        self.visit_counts = visit_counts
+        self.visit_omega = visit_omega
+        self.check_every = check_every
+        self.threshold = threshold
+        self.patience = patience
+
+        self.stability = None
+        self.stopped_at = None
+        self._calm = 0
+        self._states = None
+        self._policy = None
+
+    def start(self, agent):
+        self._saved = agent.epsilon, agent.alpha, agent.visits
+        if self.visit_counts and agent.visits is None:
+            agent.track_visits(self.visit_omega)
+        if self.check_every:
+            self._states = reachable_states()
+            self._indices = np.array([state_index(s) for s in self._states])
+            self._policy = greedy_policy(agent, self._states, self._indices)
+
+    def before_game(self, agent, games):
+        if self.epsilon is not None:
+            agent.epsilon = self.epsilon(games)
+        if self.alpha is not None:
+            agent.alpha = self.alpha(games)
+
+    def after_game(self, agent, games):
+        """
+        games: games played so far, this one included
+        returns True when training should stop
+        """
+        if not self.check_every or games % self.check_every:
+            return False
+        policy = greedy_policy(agent, self._states, self._indices)
+        self.stability = float((policy != self._policy).mean())
+        self._policy = policy
+        self._calm = self._calm + 1 if self.stability <= self.threshold else 0
+        if self._calm >= self.patience:
+            self.stopped_at = games
+            return True
+        return False
+
+    def finish(self, agent):
+        """
+        put back the epsilon / alpha / visit counting the agent had before
+        """
+        agent.epsilon, agent.alpha, agent.visits = self._saved
+
+
+def recommended():
+    """
+    explore and learn fast early, settle by 40k games: stops after about
+    50k games at ~96-97% optimal moves (solver.validate_q_table), where
+    fixed alpha=0.1 / epsilon=0.1 is at ~94% after 200k
+    """
+    return TrainingScheduler(
+        epsilon=linear(0.5, 0.05, 40000), alpha=linear(0.5, 0.1, 40000)
+    )
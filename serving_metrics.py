@@ -0,0 +1,153 @@
+import bisect
+import threading
+
+# request / decision latencies in seconds, from well under a millisecond
+# (a dict lookup) to the seconds a search or a cold model load can take
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """
+    monotonically increasing counts, one per combination of label values
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self.values.items())
+        for label_values, value in values:
+            yield self.name + _labels(self.labels, label_values), value
+
+
+class Sampled:
+    """
+    value read from `read()` at scrape time, so the hot path never touches
+    it; read returns a number or {label values: number}. A gauge, or a
+    counter kept elsewhere (e.g. book.Book.stats())
+    """
+
+    def __init__(self, name, help, read, labels=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def samples(self):
+        value = self.read()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for label_values, v in sorted(value.items()):
+            yield self.name + _labels(self.labels, label_values), v
+
+
+class Histogram:
+    """
+    Prometheus histogram: per label values, counts per bucket upper bound
+    plus the sum and count of the observations; observe() is a bisect and
+    three additions under a lock
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [bucket counts..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self.values.get(label_values)
+            if row is None:
+                row = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((k, list(row)) for k, row in self.values.items())
+        names = self.labels + ("le",)
+        for label_values, row in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row):
+                cumulative += count
+                yield (
+                    self.name + "_bucket" + _labels(names, label_values + (bound,)),
+                    cumulative,
+                )
+            yield self.name + "_sum" + _labels(self.labels, label_values), row[-1]
+            yield self.name + "_count" + _labels(self.labels, label_values), cumulative
+
+
+class Registry:
+    """
+    the metrics of one process, rendered in the Prometheus text format;
+    under gunicorn every worker has its own
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, read, labels=()):
+        return self.register(Sampled(name, help, read, labels))
+
+    def sampled_counter(self, name, help, read, labels=()):
+        return self.register(Sampled(name, help, read, labels, kind="counter"))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {value:.9g}")
+        return "\n".join(lines) + "\n"
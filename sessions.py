@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class GameStore:
+    """
+    Thread-safe store of independent games keyed by game id.
+
+    Games are created on demand by `factory()`, kept in least-recently-used
+    order and evicted when there are more than max_games or when a game has
+    not been touched for ttl seconds. Each game gets a `lock` attribute from
+    lock_factory that callers hold while they change it.
+    """
+
+    def __init__(
+        self,
+        factory,
+        max_games=10000,
+        ttl=3600,
+        clock=time.monotonic,
+        lock_factory=threading.Lock,
+    ):
+        self.factory = factory
+        self.lock_factory = lock_factory
+        self.max_games = max_games
+        self.ttl = ttl
+        self.clock = clock
+        self._games = OrderedDict()  # game_id -> (game, last_access)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._games)
+
+    def get(self, game_id=None):
+        """
+        (game_id, game) for an existing id, or a new game under a fresh id
+        when game_id is missing, unknown or expired
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._games.get(game_id) if game_id else None
+            if entry is None or now - entry[1] > self.ttl:
+                game_id = uuid.uuid4().hex
+                game = self.factory()
+                game.lock = self.lock_factory()
+            else:
+                game = entry[0]
+            self._games[game_id] = (game, now)
+            self._games.move_to_end(game_id)
+            self._evict(now)
+        return game_id, game
+
+    def remove(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def _evict(self, now):
+        while len(self._games) > self.max_games:
+            self._games.popitem(last=False)
+        # oldest first, so stop at the first game that is still fresh
+        while self._games:
+            game_id, (_, last_access) = next(iter(self._games.items()))
+            if now - last_access <= self.ttl:
+                break
+            del self._games[game_id]
+
+
+def load_test(num_players=2000, num_threads=64):
+    """
+    simulated players, each playing one full game with random moves through
+    the Flask test client; checks that no game sees another game's moves
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app import app, games
+
+    def play(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        data = client.post("/reset_game", json={}).get_json()
+        game_id = data["game_id"]
+        requests = 1
+        while True:
+            empty = [i for i, cell in enumerate(data["board"]) if cell == ""]
+            data = client.post(
+                "/make_move", json={"game_id": game_id, "move": rng.choice(empty) + 1}
+            ).get_json()
+            requests += 1
+            if data["game_id"] != game_id:
+                return requests, "game id changed"
+            marks = data["board"]
+            if not data["game_over"] and marks.count("X") != marks.count("O"):
+                return requests, "board corrupted"
+            if data["game_over"]:
+                return requests, None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(num_threads) as pool:
+        results = list(pool.map(play, range(num_players)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(requests for requests, _ in results)
+    errors = [error for _, error in results if error]
+    print(
+        f"{num_players} players, {total} requests in {elapsed:.2f}s "
+        f"({total / elapsed:,.0f} req/s), {len(errors)} errors, "
+        f"{len(games)} games in store"
+    )
+    return errors
+
+
+if __name__ == "__main__":
+    load_test()
@@ -0,0 +1,264 @@
+import random
+import time
+
+from bitboard import _BASE3, FULL_MASK, WINNING
+from board import Board
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def state_to_bits(state):
+    x_bits = o_bits = 0
+    for i, cell in enumerate(state):
+        if cell == Board.PLAYER_X:
+            x_bits |= 1 << i
+        elif cell == Board.PLAYER_O:
+            o_bits |= 1 << i
+    return x_bits, o_bits
+
+
+def _empties(x_bits, o_bits):
+    return 9 - bin(x_bits | o_bits).count("1")
+
+
+def _moves(x_bits, o_bits):
+    occupied = x_bits | o_bits
+    return [i for i in range(9) if not occupied >> i & 1]
+
+
+class Solver:
+    """
+    Negamax with alpha-beta pruning and a transposition table over
+    (x_bits, o_bits). Values are from the side to move: 0 draw, a win is
+    1 + empty cells left at the end (faster wins score higher), a loss the
+    negative of that. X moves when both players have the same count.
+    """
+
+    def __init__(self):
+        self.tt = {}
+        self.values = {}
+        self.best_moves = {}
+        self.nodes = 0
+
+    def negamax(self, x_bits, o_bits, alpha=-10, beta=10):
+        self.nodes += 1
+        key = x_bits | (o_bits << 9)
+        entry = self.tt.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            elif flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        x_to_move = _empties(x_bits, o_bits) % 2 == 1
+        other = o_bits if x_to_move else x_bits
+        if WINNING[other]:
+            # the previous move completed a line
+            return -(1 + _empties(x_bits, o_bits))
+        if (x_bits | o_bits) == FULL_MASK:
+            return 0
+
+        alpha_orig = alpha
+        best = -10
+        for cell in _moves(x_bits, o_bits):
+            bit = 1 << cell
+            if x_to_move:
+                value = -self.negamax(x_bits | bit, o_bits, -beta, -alpha)
+            else:
+                value = -self.negamax(x_bits, o_bits | bit, -beta, -alpha)
+            best = max(best, value)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt[key] = (best, flag)
+        return best
+
+    def value(self, x_bits, o_bits):
+        key = x_bits | (o_bits << 9)
+        value = self.values.get(key)
+        if value is None:
+            value = self.values[key] = self.negamax(x_bits, o_bits)
+        return value
+
+    def move_values(self, x_bits, o_bits):
+        x_to_move = _empties(x_bits, o_bits) % 2 == 1
+        values = {}
+        for cell in _moves(x_bits, o_bits):
+            bit = 1 << cell
+            if x_to_move:
+                values[cell] = -self.value(x_bits | bit, o_bits)
+            else:
+                values[cell] = -self.value(x_bits, o_bits | bit)
+        return values
+
+    def best_actions(self, x_bits, o_bits):
+        key = x_bits | (o_bits << 9)
+        best = self.best_moves.get(key)
+        if best is None:
+            values = self.move_values(x_bits, o_bits)
+            top = max(values.values())
+            best = self.best_moves[key] = tuple(
+                a for a, v in values.items() if v == top
+            )
+        return best
+
+    def solve_all(self):
+        """
+        exact value and best moves for every position reachable from the
+        empty board with X first
+        """
+        seen = set()
+        stack = [(0, 0)]
+        while stack:
+            x_bits, o_bits = stack.pop()
+            key = x_bits | (o_bits << 9)
+            if key in seen:
+                continue
+            seen.add(key)
+            self.value(x_bits, o_bits)
+            if is_terminal(x_bits, o_bits):
+                continue
+            self.best_actions(x_bits, o_bits)
+            x_to_move = _empties(x_bits, o_bits) % 2 == 1
+            for cell in _moves(x_bits, o_bits):
+                bit = 1 << cell
+                stack.append(
+                    (x_bits | bit, o_bits) if x_to_move else (x_bits, o_bits | bit)
+                )
+        return len(seen)
+
+
+def is_terminal(x_bits, o_bits):
+    return WINNING[x_bits] or WINNING[o_bits] or (x_bits | o_bits) == FULL_MASK
+
+
+_SOLVER = None
+
+
+def get_solver():
+    global _SOLVER
+    if _SOLVER is None:
+        _SOLVER = Solver()
+        _SOLVER.solve_all()
+    return _SOLVER
+
+
+class SolverAgent:
+    """
+    Perfect play with the same choose_action / greedy_action surface as
+    QLearningAgent. Nothing to learn, so update_q_table and save_model are
+    no-ops and load_model just runs the solve.
+    """
+
+    def __init__(self, alpha=0.0, gamma=0.9, epsilon=0.0):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.q_table = None
+        self.solver = None
+
+    def greedy_action(self, state, available_actions):
+        if self.solver is None:
+            self.solver = get_solver()
+        return random.choice(self.solver.best_actions(*state_to_bits(state)))
+
+    def choose_action(self, state, available_actions):
+        return self.greedy_action(state, available_actions)
+
+    def update_q_table(self, state, action, reward, next_state, available_actions):
+        return 0.0
+
+    def save_model(self, filename=None):
+        pass
+
+    def load_model(self, filename=None):
+        self.solver = get_solver()
+        print("Solver ready.")
+
+
+def _reachable(solver):
+    for key in solver.best_moves:
+        yield key & FULL_MASK, key >> 9
+
+
+def _bits_to_state(x_bits, o_bits):
+    from board import index_to_state
+
+    return index_to_state(_BASE3[x_bits] + 2 * _BASE3[o_bits])
+
+
+def seed_q_table(agent, solver=None):
+    """
+    write game-theoretic Q-values into a learning agent: +/-gamma**(d-1) for
+    a win/loss d plies away under perfect play (the discount
+    update_from_history applies), 0 for a draw
+    """
+    solver = solver or get_solver()
+    for x_bits, o_bits in _reachable(solver):
+        state = _bits_to_state(x_bits, o_bits)
+        empties = _empties(x_bits, o_bits)
+        for action, value in solver.move_values(x_bits, o_bits).items():
+            if value == 0:
+                q = 0.0
+            else:
+                distance = empties - (abs(value) - 1)
+                q = (1 if value > 0 else -1) * agent.gamma ** (distance - 1)
+            agent.set_q_value(state, action, q)
+
+
+def validate_q_table(agent, solver=None):
+    """
+    fraction of reachable positions where the agent's greedy move keeps the
+    game-theoretic result (win/draw/loss), plus the failing positions
+    """
+    solver = solver or get_solver()
+    mistakes = []
+    total = 0
+    for x_bits, o_bits in _reachable(solver):
+        state = _bits_to_state(x_bits, o_bits)
+        values = solver.move_values(x_bits, o_bits)
+        action = agent.greedy_action(state, list(values))
+        total += 1
+        best = max(values.values())
+        if (values[action] > 0) - (values[action] < 0) != (best > 0) - (best < 0):
+            mistakes.append((state, action))
+    return 1 - len(mistakes) / total, mistakes
+
+
+if __name__ == "__main__":
+    from train import QLearningAgent
+
+    start = time.perf_counter()
+    solver = get_solver()
+    solve_time = time.perf_counter() - start
+    positions = len(solver.best_moves)
+    print(
+        f"solved {len(solver.values)} positions ({positions} non-terminal), "
+        f"{solver.nodes} nodes in {solve_time * 1000:.1f} ms"
+    )
+    print(f"value of the empty board: {solver.value(0, 0)}")
+
+    agent = SolverAgent()
+    states = [_bits_to_state(x, o) for x, o in _reachable(solver)]
+    start = time.perf_counter()
+    for state in states:
+        agent.greedy_action(state, None)
+    latency = (time.perf_counter() - start) / len(states)
+    print(f"per-move latency: {latency * 1e6:.2f} us")
+
+    q_agent = QLearningAgent()
+    q_agent.load_model("q_table.qtb")
+    accuracy, mistakes = validate_q_table(q_agent, solver)
+    print(f"q_table.qtb keeps the optimal result in {accuracy:.1%} of positions")
@@ -0,0 +1,113 @@
+import time
+
+from train import QLearningAgent, evaluate_against_random, train_with_self_play
+
+# the 8 rotations/reflections of the square as (row, col) -> (row, col)
+_COORD_TRANSFORMS = (
+    lambda r, c: (r, c),
+    lambda r, c: (c, 2 - r),
+    lambda r, c: (2 - r, 2 - c),
+    lambda r, c: (2 - c, r),
+    lambda r, c: (r, 2 - c),
+    lambda r, c: (2 - r, c),
+    lambda r, c: (c, r),
+    lambda r, c: (2 - c, 2 - r),
+)
+
+# DST[t][i]: where cell i lands under transform t (also maps actions)
+DST = tuple(
+    tuple(f(i // 3, i % 3)[0] * 3 + f(i // 3, i % 3)[1] for i in range(9))
+    for f in _COORD_TRANSFORMS
+)
+# SRC[t][j]: which original cell ends up at j, transformed[j] = state[SRC[t][j]]
+SRC = tuple(tuple(dst.index(j) for j in range(9)) for dst in DST)
+
+_CANON_CACHE = {}
+
+
+def transform_state(state, t):
+    src = SRC[t]
+    return tuple(state[src[j]] for j in range(9))
+
+
+def canonicalize(state):
+    """
+    (representative, action_map): the smallest of the 8 symmetric boards and
+    where each action lands on it. Boards that are symmetric to themselves
+    send equivalent actions to the same cell.
+    """
+    state = tuple(state)
+    result = _CANON_CACHE.get(state)
+    if result is None:
+        boards = [transform_state(state, t) for t in range(8)]
+        canon = min(boards)
+        stabilizers = [t for t in range(8) if boards[t] == canon]
+        action_map = tuple(min(DST[t][a] for t in stabilizers) for a in range(9))
+        result = _CANON_CACHE[state] = (canon, action_map)
+    return result
+
+
+def canonical_action(state, action):
+    canon, action_map = canonicalize(state)
+    return canon, action_map[action]
+
+
+_INDEX_TABLES = None
+
+
+def canonical_index_tables():
+    """
+    numpy version of canonicalize() over all 3**9 state ids:
+    canon[id] -> canonical id, action_map[id, a] -> action on that board
+    """
+    global _INDEX_TABLES
+    if _INDEX_TABLES is None:
+        import numpy as np
+
+        from dense_q import _POW3, DIGITS
+
+        src = np.array(SRC)
+        dst = np.array(DST)
+        # ids[:, t] = state id of the board after transform t
+        ids = np.stack([DIGITS[:, src[t]] @ _POW3 for t in range(8)], axis=1)
+        canon = ids.min(axis=1)
+        stabilizer = ids == canon[:, None]
+        action_map = np.where(stabilizer[:, :, None], dst[None], 9).min(axis=1)
+        _INDEX_TABLES = (canon, action_map)
+    return _INDEX_TABLES
+
+
+class SymmetricQLearningAgent(QLearningAgent):
+    """
+    QLearningAgent that stores one entry per symmetry class: every
+    (state, action) is keyed by its canonical board and the action as seen
+    on that board.
+    """
+
+    def _key(self, state, action):
+        return canonical_action(state, action)
+
+
+def compare(num_games=50000, chunks=10, eval_games=1000):
+    """
+    train the plain and the symmetric agent side by side and report
+    strength against a random opponent and table size per chunk
+    """
+    agents = {"plain": QLearningAgent(), "symmetric": SymmetricQLearningAgent()}
+    for chunk in range(1, chunks + 1):
+        for name, agent in agents.items():
+            start = time.perf_counter()
+            train_with_self_play(
+                agent, num_games // chunks, use_bitboard=True, save=False
+            )
+            elapsed = time.perf_counter() - start
+            win, draw, loss = evaluate_against_random(agent, eval_games)
+            print(
+                f"{chunk * num_games // chunks:>9} games {name:>9}: "
+                f"win {win:.3f} draw {draw:.3f} loss {loss:.3f} "
+                f"entries {len(agent.q_table):>6} ({elapsed:.1f}s)"
+            )
+
+
+if __name__ == "__main__":
+    compare()
@@ -1,10 +1,9 @@
-import pickle
 import random
 
-from tqdm import tqdm
-
+from bitboard import make_board
 from board import Board
-from move import Move
+from player import Player
+from transitions import index_of, legal_actions, tables
 
 
 class QLearningAgent:
@@ -27,15 +26,57 @@ class QLearningAgent:
         self.gamma = gamma
         self.epsilon = epsilon
         self.q_table = {}
+        # set of changed keys while a CheckpointLog tracks this agent
+        self.dirty = None
+        # per-entry update counts once track_visits() is called
+        self.visits = None
+        self.visit_omega = 0.6
+        # book.Book consulted before the Q-table when serving
+        self.book = None
+
+    def _key(self, state, action):
+        return (tuple(state), action)
+
+    def track_visits(self, omega=0.6):
+        """
+        per-entry learning rate: the n-th update of an entry uses
+        max(alpha, n ** -omega), so rarely seen entries learn fast and
+        alpha becomes the floor
+        """
+        self.visits = {}
+        self.visit_omega = omega
+
+    def _visit_alpha(self, key):
+        n = self.visits[key] = self.visits.get(key, 0) + 1
+        return max(self.alpha, n**-self.visit_omega)
 
     def get_q_value(self, state, action):
-        return self.q_table.get((tuple(state), action), 0.0)
+        return self.q_table.get(self._key(state, action), 0.0)
+
+    def has_state(self, state):
+        """
+        whether any legal action of state has an entry, i.e. was ever updated
+        """
+        return any(self._key(state, a) in self.q_table for a in legal_actions(state))
+
+    def set_q_value(self, state, action, value):
+        key = self._key(state, action)
+        self.q_table[key] = value
+        if self.dirty is not None:
+            self.dirty.add(key)
 
     def choose_action(self, state, available_actions):
+        if self.book is not None:
+            action = self.book.lookup(state, available_actions)
+            if action is not None:
+                return action
         # epsilon 探索率
         if random.random() < self.epsilon:
             return random.choice(available_actions)
 
+        return self.greedy_action(state, available_actions)
+
+    def greedy_action(self, state, available_actions):
         q_values = [self.get_q_value(state, a) for a in available_actions]
         max_q = max(q_values)
         best_actions = [a for a, q in zip(available_actions, q_values) if q == max_q]
@@ -53,17 +94,38 @@ class QLearningAgent:
         
         new_q = 舊的q值 + 學習率 * (當下獎勵 + 折扣因子*下一步最大q值 - 舊的q值)
         """
-        new_q = old_q + self.alpha * (reward + self.gamma * next_max_q - old_q)
-        self.q_table[(tuple(state), action)] = new_q
+        alpha = (
+            self.alpha
+            if self.visits is None
+            else self._visit_alpha(self._key(state, action))
+        )
+        new_q = old_q + alpha * (reward + self.gamma * next_max_q - old_q)
+        self.set_q_value(state, action, new_q)
+        return new_q - old_q
 
     def save_model(self, filename="q_learning_model.pkl"):
+        # *.qtb uses the binary format in model_format, anything else pickle
+        if filename.endswith(".qtb"):
+            from model_format import write_q_table
+
+            write_q_table(filename, self.q_table)
+            return
+        import pickle
+
         with open(filename, "wb") as f:
             pickle.dump(self.q_table, f)
 
     def load_model(self, filename="q_learning_model.pkl"):
         try:
-            with open(filename, "rb") as f:
-                self.q_table = pickle.load(f)
+            from model_format import is_q_table_file, read_q_table
+
+            if is_q_table_file(filename):
+                self.q_table = read_q_table(filename)
+            else:
+                import pickle
+
+                with open(filename, "rb") as f:
+                    self.q_table = pickle.load(f)
             print("Model loaded successfully.")
         except FileNotFoundError:
             print("No existing model found. Starting with a new model.")
@@ -72,67 +134,169 @@ class QLearningAgent:
 def play_self_training_game(agent, board):
     """
     slef play with train
+    the game is stepped through the transitions tables; board is only set
+    to the final position at the end
     """
-    state = board.board_to_state()
+    states, actions, _, successors, terminal, winner = tables()
+    index = index_of(board.board_to_state())
     game_history = []
     current_player = Board.PLAYER_X
 
     while True:
-        available_actions = [i for i in range(9) if state[i] == Board.EMPTY_CELL]
-        action = agent.choose_action(state, available_actions)
-        move = Move(action + 1)
+        state = states[index]
+        action = agent.choose_action(state, actions[index])
         game_history.append((state, action, current_player))
-        """
-        board.step(move, player_marker)
-        next_state, reward, done, _ = next_state, 0, False, {}
-        """
-        next_state, reward, done, _ = board.step(
-            move, "X" if current_player == Board.PLAYER_X else "O"
-        )
+        index = successors[index][action]
 
-        if done:
-            # Adjust reward based on the current player's perspective
-            adjusted_reward = reward if current_player == Board.PLAYER_X else -reward
-            return game_history, adjusted_reward
+        if terminal[index]:
+            board.set_state(states[index])
+            # from X's perspective: 1 X won, -1 O won, 0 tie
+            return game_history, winner[index]
 
-        state = next_state
         # swithch player
         current_player = (
             Board.PLAYER_O if current_player == Board.PLAYER_X else Board.PLAYER_X
         )
 
 
-def train_with_self_play(agent, num_games=10000):
+def update_from_history(agent, game_history, final_reward, next_state):
+    """
+    unwind one finished self-play game, last move first
+    returns the summed absolute change of the updated Q-values
+    """
+    # next_state :[1,0,-1,0,0,1,-1,0,0]]
+    # available_actions () once the game is over
+    available_actions = legal_actions(next_state)
+    total_delta = 0.0
+    for state, action, player in reversed(game_history):
+        # Adjust reward based on the player's perspective
+        player_reward = final_reward if player == Board.PLAYER_X else -final_reward
+
+        total_delta += abs(
+            agent.update_q_table(
+                state, action, player_reward, next_state, available_actions
+            )
+        )
+        final_reward *= agent.gamma  # Discount the reward for earlier actions
+    return total_delta
+
+
+def update_from_live_game(agent, game_history, final_reward, next_state):
+    """
+    same unwinding for a game against a human: game_history holds only the
+    agent's own (state, action) pairs and final_reward is from its side
+    """
+    available_actions = legal_actions(next_state)
+    for state, action in reversed(game_history):
+        agent.update_q_table(state, action, final_reward, next_state, available_actions)
+        final_reward *= agent.gamma  # Discount the reward for earlier actions
+
+
+def train_with_self_play(
+    agent,
+    num_games=10000,
+    use_bitboard=False,
+    save=True,
+    metrics=None,
+    scheduler=None,
+    replay=None,
+):
     """
     training 20 minllions times
+    metrics: a metrics.TrainingMetrics; by default one without file or
+    evaluations that only shows the latest window on the progress bar
+    scheduler: a scheduler.TrainingScheduler for epsilon / alpha decay and
+    early stopping; num_games is then the upper bound
+    replay: a replay.ReplayBuffer; games go into it and each game is
+    followed by one minibatch update instead of unwinding the game
     """
-    board = Board()
+    # training-only dependencies, kept off the play paths' import time
+    from tqdm import tqdm
+
+    from metrics import TrainingMetrics
+
+    board = make_board(use_bitboard)
+    if metrics is None:
+        metrics = TrainingMetrics(agent, eval_every=0)
+    # self-play has to explore the book positions too
+    book = getattr(agent, "book", None)
+    agent.book = None
+
+    if scheduler is not None:
+        scheduler.start(agent)
 
     # tqdm 進度條
-    rewards = []
-    for _ in tqdm(range(num_games), desc="Training Progress"):
+    progress = tqdm(range(num_games), desc="Training Progress")
+    for games in progress:
+        if scheduler is not None:
+            scheduler.before_game(agent, games)
         board.reset_board()
         # agent:QLearningAgent()
         game_history, final_reward = play_self_training_game(agent, board)
-        rewards.append(final_reward)
 
         # Update Q-table
-        for state, action, player in reversed(game_history):
-            # next_state :[1,0,-1,0,0,1,-1,0,0]]
-            next_state = board.board_to_state()
-            # available_actions [1,3,4,7,8]
-            available_actions = [
-                i for i in range(9) if next_state[i] == Board.EMPTY_CELL
-            ]
+        if replay is not None:
+            replay.add_self_play(
+                game_history, final_reward, board.board_to_state(), agent.gamma
+            )
+            delta, updates = replay.train(agent), replay.batch_size
+        else:
+            updates = len(game_history)
+            delta = update_from_history(
+                agent, game_history, final_reward, board.board_to_state()
+            )
+        row = metrics.record(final_reward, delta, updates)
+        if row is not None:
+            progress.set_postfix(
+                x_win=row["x_win"], draw=row["draw"], o_win=row["o_win"]
+            )
+        if scheduler is not None and scheduler.after_game(agent, games + 1):
+            print(f"Policy stable, stopping after {games + 1} games.")
+            break
+    progress.close()
+    metrics.flush()
+    if scheduler is not None:
+        scheduler.finish(agent)
+    agent.book = book
 
-            # Adjust reward based on the player's perspective
-            player_reward = final_reward if player == Board.PLAYER_X else -final_reward
+    if save:
+        agent.save_model()
+    print(metrics.mean_reward)
+
+
+def evaluate_against_random(agent, num_games=1000, agent_marker="O"):
+    """
+    greedy agent vs uniformly random opponent, X always moves first
+    returns (win, draw, loss) rates from the agent's point of view
+    """
+    return evaluate(agent, Player(is_human=False), num_games, agent_marker)
 
-            agent.update_q_table(
-                state, action, player_reward, next_state, available_actions
-            )
-            final_reward *= agent.gamma  # Discount the reward for earlier actions
 
-    agent.save_model()
-    average_reward = sum(rewards) / len(rewards)
-    print(average_reward)
+def evaluate(agent, opponent, num_games=1000, agent_marker="O"):
+    """
+    greedy agent vs a computer Player (random moves, or use_solver=True for
+    perfect play), X always moves first
+    returns (win, draw, loss) rates from the agent's point of view
+    """
+    board = Board()
+    wins = draws = 0
+    for _ in range(num_games):
+        board.reset_board()
+        marker = "X"
+        while True:
+            state = board.board_to_state()
+            available_actions = legal_actions(state)
+            if marker == agent_marker:
+                move = agent.greedy_action(state, available_actions) + 1
+            else:
+                move = opponent.get_move(board)
+            _, reward, done, _ = board.step(move, marker)
+            if done:
+                if reward == 0:
+                    draws += 1
+                elif marker == agent_marker:
+                    wins += 1
+                break
+            marker = "O" if marker == "X" else "X"
+    losses = num_games - wins - draws
+    return wins / num_games, draws / num_games, losses / num_games
@@ -0,0 +1,128 @@
+from bitboard import _BASE3, FULL_MASK, WINNING
+from board import Board
+
+# filled by _build() on first use, all indexed by board.state_index id;
+# positions that cannot be reached from the empty board are None / 0
+STATES = None  # id -> state tuple
+ACTIONS = None  # id -> legal actions, () once the game is over
+MASKS = None  # id -> legal actions as a 9-bit mask
+NEXT = None  # id -> 9 successor ids, -1 for an occupied cell
+TERMINAL = None  # id -> game over
+WINNER = None  # id -> Board.PLAYER_X / PLAYER_O, 0 for no winner (yet)
+_INDEX = None  # state tuple -> id
+
+NUM_REACHABLE = 5478
+
+
+def _build():
+    """
+    walk every position reachable from the empty board with X first
+    """
+    global STATES, ACTIONS, MASKS, NEXT, TERMINAL, WINNER, _INDEX
+    size = 3**9
+    states, actions, masks = [None] * size, [None] * size, [0] * size
+    successors, terminal, winner = [None] * size, [False] * size, [0] * size
+    index_of = {}
+
+    stack = [(0, 0)]
+    while stack:
+        x_bits, o_bits = stack.pop()
+        index = _BASE3[x_bits] + 2 * _BASE3[o_bits]
+        if states[index] is not None:
+            continue
+        state = tuple(
+            (
+                Board.PLAYER_X
+                if x_bits >> i & 1
+                else Board.PLAYER_O if o_bits >> i & 1 else Board.EMPTY_CELL
+            )
+            for i in range(9)
+        )
+        states[index] = state
+        index_of[state] = index
+        occupied = x_bits | o_bits
+        if WINNING[x_bits] or WINNING[o_bits] or occupied == FULL_MASK:
+            terminal[index] = True
+            winner[index] = (
+                Board.PLAYER_X
+                if WINNING[x_bits]
+                else Board.PLAYER_O if WINNING[o_bits] else 0
+            )
+            actions[index] = ()
+            successors[index] = (-1,) * 9
+            continue
+
+        x_to_move = bin(x_bits).count("1") == bin(o_bits).count("1")
+        free = [i for i in range(9) if not occupied >> i & 1]
+        actions[index] = tuple(free)
+        masks[index] = FULL_MASK & ~occupied
+        # placing a stone adds its base-3 digit (1 for X, 2 for O)
+        digit = 1 if x_to_move else 2
+        successors[index] = tuple(
+            index + digit * 3**i if i in free else -1 for i in range(9)
+        )
+        for i in free:
+            stack.append(
+                (x_bits | 1 << i, o_bits) if x_to_move else (x_bits, o_bits | 1 << i)
+            )
+
+    STATES, ACTIONS, MASKS, NEXT = states, actions, masks, successors
+    TERMINAL, WINNER, _INDEX = terminal, winner, index_of
+
+
+def tables():
+    """
+    (STATES, ACTIONS, MASKS, NEXT, TERMINAL, WINNER), built on the first call;
+    hot loops bind these lists once and step a game with plain indexing
+    """
+    if STATES is None:
+        _build()
+    return STATES, ACTIONS, MASKS, NEXT, TERMINAL, WINNER
+
+
+def index_of(state):
+    """
+    id of a reachable state (list or tuple), None for any other board
+    """
+    if _INDEX is None:
+        _build()
+    return _INDEX.get(tuple(state))
+
+
+def legal_actions(state):
+    """
+    empty cells of a position, () once the game is over
+    """
+    index = index_of(state)
+    if index is None:
+        # not reachable with X first (edited boards, tests)
+        return tuple(i for i in range(9) if state[i] == Board.EMPTY_CELL)
+    return ACTIONS[index]
+
+
+def legal_mask(state):
+    """
+    legal_actions as a 9-bit mask
+    """
+    index = index_of(state)
+    if index is None:
+        return sum(1 << i for i in range(9) if state[i] == Board.EMPTY_CELL)
+    return MASKS[index]
+
+
+def successor(index, action):
+    if STATES is None:
+        _build()
+    return NEXT[index][action]
+
+
+def is_terminal(index):
+    if STATES is None:
+        _build()
+    return TERMINAL[index]
+
+
+def winner(index):
+    if STATES is None:
+        _build()
+    return WINNER[index]